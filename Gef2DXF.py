@@ -1,4 +1,5 @@
 import ezdxf
+import numpy as np
 
 
 def drange(start, stop, step):
@@ -10,6 +11,41 @@ def drange(start, stop, step):
     return [float(v) / 100 for v in trange]
 
 
+def simplify_polyline(xs, ys, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification of a polyline
+    :param xs: array with X coordinates
+    :param ys: array with Y coordinates
+    :param tolerance: maximum distance in map units between the original and the simplified line
+    :return: boolean array, True for the vertices to keep (first and last vertex are always kept)
+    """
+    keep = np.zeros(len(xs), dtype=bool)
+    if len(xs) == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx = xs[last] - xs[first]
+        dy = ys[last] - ys[first]
+        px = xs[first + 1:last] - xs[first]
+        py = ys[first + 1:last] - ys[first]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(px * dy - py * dx) / length
+        i_max = int(np.argmax(distances))
+        if distances[i_max] > tolerance:
+            split = first + 1 + i_max
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
 class GraphExtent(object):
     def __init__(self, x_center=0, y_center=0):
         self._x_left = x_center
@@ -55,20 +91,20 @@ class GraphExtent(object):
 
 
 class Gef2DXF:
-    def __init__(self, a_GEF2OpenClass_object, existing_ezdxf=None, use_corrected_depth=False):
+    def __init__(self, a_GEF2OpenClass_object, existing_ezdxf=None, use_corrected_depth=False, compact=False):
 
         """
         Initialise the class
         :param a_gef_file: a GEF2OpenClass object with an properly processed GEF file
         :param existing_ezdxf: a existing dwg (as ezdxf object)
         :param use_corrected_depth: If true corrected depth (quantity number 11) is used instead of penetration length
+        :param compact: If true graph lines are written as one LWPOLYLINE each instead of a POLYLINE with
+                        a VERTEX entity per point, which gives much smaller DXF files with the same drawing
         """
         self.gef = a_GEF2OpenClass_object
+        self.compact = compact
         if use_corrected_depth:
-            if self.gef.qn2column(11) is None:
-                self.depth_col = 1
-            else:
-                self.depth_col = self.gef.qn2column(11)
+            self.depth_col = self.gef.quantity_columns.get(11, 1)
         else:
             self.depth_col = 1
 
@@ -90,6 +126,10 @@ class Gef2DXF:
         self._origin_x = 0
         self._origin_y = 0
 
+        # Number of graph line vertices before and after simplification (see draw_graph_line)
+        self.vertices_in = 0
+        self.vertices_out = 0
+
     def set_base_of_origin(self, x, y):
         """
         Set the base of origin for placing the graph on an other location than x=0, y=0
@@ -103,7 +143,7 @@ class Gef2DXF:
         self.extent = GraphExtent(x_center=x, y_center=y)
 
     def draw_graph_line(self, i_kol, value_factor, depth_factor, place_left=False, color=0,
-                        max_value=None, label_height=0.2):
+                        max_value=None, label_height=0.2, simplify_tolerance=None):
         """
         Draw a vertical graph_line
         :param i_kol: index of column in GEF file
@@ -113,7 +153,9 @@ class Gef2DXF:
         :param color: line color in AutoCAD Color Index
         :param max_value: line is cutoff on maximum value and replaced with a label
         :param label_height: label height in map units
-         
+        :param simplify_tolerance: if given the line is simplified (Ramer-Douglas-Peucker) with this
+                                   maximum deviation in map units, e.g. 0.01 for a deviation of 0.01 mm at 1:1000
+        :return: number of vertices (before, after) simplification
         """
 
         # Change depth factor to negative for drawing underground
@@ -124,72 +166,90 @@ class Gef2DXF:
         if layername not in self.drawing.layers:
             self.drawing.layers.new(name=layername, dxfattribs={'color': color})
 
-        points = list()
-        value_prev = 0
+        depths = np.asarray(self.gef.get_column_array(self.depth_col), dtype=np.float64)
+        values = self._column_values(i_kol)
 
-        extreme_range = False
-        lst_extreme_range = list()
+        # Replace missing data (NaN) with previous value, 0 before the first value
+        valid = ~np.isnan(values)
+        previous = np.maximum.accumulate(np.where(valid, np.arange(len(values)), 0))
+        values = np.where(np.maximum.accumulate(valid), values[previous], 0.0)
 
-        for depth, value in self.gef.get_data_iter(i_kol, depth_col=self.depth_col):
-            # Replace None with previous value for missing data
-            if value is None:
-                value = value_prev
-            else:
-                value_prev = value
-
-            # Check if extreme value
-            if max_value is not None:
-                if value > max_value:
-                    extreme = True
-                    if extreme_range:  # Add value to extreme range
-                        lst_extreme_range.append([depth, value])
-                    else:  # Start a new extreme range
-                        extreme_range = True
-                        print 'Start extreme range {}'.format(max_value)
-                        lst_extreme_range = list()
-                else:
-                    extreme = False
-                    if extreme_range:  # Process end of extreme range
-
-                        depth_mean = (lst_extreme_range[0][0] + lst_extreme_range[-1][0]) / 2
-                        value_max = max([v[1] for v in lst_extreme_range])
-                        value_min = min([v[1] for v in lst_extreme_range])
-
-                        if place_left:  # For left hand drawing
-                            max_value_x = max_value * -1
-                        else:
-                            max_value_x = max_value
-
-                        # Place the label
-                        x = self._origin_x + max_value_x * value_factor
-                        y = self._origin_y + depth_mean * depth_factor
-                        text = self.modelspace.add_text(value_max, dxfattribs={'layer': layername,
-                                                                               'height': label_height})
-                        if place_left:
-                            text.set_pos((x, y), align='MIDDLE_RIGHT')
-                        else:
-                            text.set_pos((x, y), align='MIDDLE_LEFT')
-
-                        for depth_ext, value_ext in lst_extreme_range:
-                            print '{}: {}'.format(depth_ext, value_ext)
-                        print 'Einde extreme range'
-                        extreme_range = False
-            else:
-                extreme = False
+        # Extreme values are cut off and replaced with a label per extreme range
+        if max_value is not None:
+            extreme = values > max_value
+        else:
+            extreme = np.zeros(len(values), dtype=bool)
 
-            # Change value to negative for left hand drawing
+        if place_left:  # For left hand drawing
+            sign = -1
+        else:
+            sign = 1
+
+        # Extreme ranges are labelled when they end; a range still open at the last scan gets no label
+        edges = np.diff(np.concatenate(([0], extreme.astype(np.int8), [0])))
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            if end == len(values):
+                continue
+            # The label is based on the range without its first scan, as it always has been
+            first = start + 1 if end - start > 1 else start
+            depth_mean = (depths[first] + depths[end - 1]) / 2
+            value_max = float(values[first:end].max())
+
+            x = self._origin_x + sign * max_value * value_factor
+            y = self._origin_y + depth_mean * depth_factor
+            text = self.modelspace.add_text(value_max, dxfattribs={'layer': layername, 'height': label_height})
             if place_left:
-                value *= -1
-
-            # Move the coordinates to the origin
-            x = self._origin_x + value * value_factor
-            y = self._origin_y + depth * depth_factor
-
-            # Save value
-            if not extreme:
-                points.append((x, y))
+                text.set_pos((x, y), align='MIDDLE_RIGHT')
+            else:
+                text.set_pos((x, y), align='MIDDLE_LEFT')
+
+        # Move the coordinates to the origin
+        xs = self._origin_x + sign * values * value_factor
+        ys = self._origin_y + depths * depth_factor
+
+        # One polyline per visible run between extreme ranges
+        visible = np.concatenate(([0], (~extreme).astype(np.int8), [0]))
+        edges = np.diff(visible)
+        vertices_in = 0
+        vertices_out = 0
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            if end - start > 1:
+                run_xs = xs[start:end]
+                run_ys = ys[start:end]
+                vertices_in += len(run_xs)
+                if simplify_tolerance:
+                    keep = simplify_polyline(run_xs, run_ys, simplify_tolerance)
+                    run_xs = run_xs[keep]
+                    run_ys = run_ys[keep]
+                vertices_out += len(run_xs)
+                self._add_polyline(zip(run_xs.tolist(), run_ys.tolist()), layername)
+
+        self.vertices_in += vertices_in
+        self.vertices_out += vertices_out
+        return vertices_in, vertices_out
+
+    def _add_polyline(self, points, layername):
+        """
+        Add a polyline as LWPOLYLINE (compact) or as POLYLINE with VERTEX entities
+        :param points: list of (x, y) tuples
+        :param layername: name of the layer
+        """
+        if self.compact:
+            self.modelspace.add_lwpolyline(points, dxfattribs={'layer': layername})
+        else:
+            self.modelspace.add_polyline2d(points, dxfattribs={'layer': layername})
 
-        self.modelspace.add_polyline2d(points, dxfattribs={'layer': layername})
+    def _column_values(self, i_kol):
+        """
+        Return the values of a column as a new float array with missing data (COLUMNVOID) as NaN
+        :param i_kol: index of column in GEF file
+        """
+        values = np.array(self.gef.get_column_array(i_kol), dtype=np.float64)
+        if self.gef.get_column_void_flag(i_kol):
+            void = self.gef.get_column_void(i_kol)
+            if isinstance(void, float):
+                values[values == void] = np.nan
+        return values
 
     def draw_vertical_ax(self, depth_factor, offset_value, label_height=0.2):
         """
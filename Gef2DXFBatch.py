@@ -0,0 +1,195 @@
+import os
+import time
+import multiprocessing
+
+import ezdxf
+import numpy as np
+
+import Gef2Open
+from Gef2DXF import Gef2DXF
+
+# Default layout, identical to the example in Gef2DXF.__main__.
+# Panels refer to a GEF quantity number ('quantity') or directly to a column ('i_kol').
+DEFAULT_LAYOUT = {
+    'use_corrected_depth': False,
+    'depth_factor': 1,
+    'depth_offset': 1,  # separation between depth labels
+    'compact': False,  # LWPOLYLINE graph lines, see Gef2DXF
+    'simplify_tolerance': None,  # maximum deviation in map units of simplified graph lines, None for no simplification
+    'raster': {'value_factor': 1, 'offset_value': 1},  # None for no raster
+    'panels': [
+        {'quantity': 2, 'value_factor': 0.4, 'max_value': 30, 'offset_value': 5, 'color': 54,
+         'place_left': True, 'place_bottom': False},  # Cone resistance MPa
+        {'quantity': 3, 'value_factor': 20, 'max_value': 0.5, 'offset_value': 0.1, 'color': 4,
+         'place_left': True, 'place_bottom': True},  # Local friction MPa
+        {'quantity': 4, 'value_factor': 1, 'max_value': 12, 'offset_value': 2, 'color': 40,
+         'place_left': False, 'place_bottom': False},  # Friction ratio %
+        {'quantity': 6, 'value_factor': 20, 'max_value': 0.5, 'offset_value': 0.1, 'color': 1,
+         'place_left': False, 'place_bottom': True},  # Pore pressure u2 MPa
+    ],
+}
+
+
+def panel_column(gef, panel):
+    """
+    Return the column index for a layout panel, or None when the quantity is not in the GEF file.
+    :param gef: a Gef2OpenClass object
+    :param panel: panel dictionary from a layout
+    """
+    if 'i_kol' in panel:
+        return panel['i_kol']
+    return gef.quantity_columns.get(panel['quantity'])
+
+
+def layout_extent(layout):
+    """
+    Return the horizontal extent (left, right) in map units of a rendered layout, relative to the origin.
+    :param layout: layout dictionary
+    """
+    left = max([p['max_value'] * p['value_factor'] for p in layout['panels'] if p.get('place_left')] + [0])
+    right = max([p['max_value'] * p['value_factor'] for p in layout['panels'] if not p.get('place_left')] + [0])
+    return left, right
+
+
+def render_gef(gef, layout=None, drawing=None, origin=(0, 0)):
+    """
+    Render all panels of a layout for one GEF file.
+    :param gef: a Gef2OpenClass object with a properly processed GEF file
+    :param layout: layout dictionary, see DEFAULT_LAYOUT
+    :param drawing: existing ezdxf drawing to draw into, a new drawing is created if None
+    :param origin: base of origin (top of the vertical ax) in map units
+    :return: the Gef2DXF object used for rendering
+    """
+    if layout is None:
+        layout = DEFAULT_LAYOUT
+    graph = Gef2DXF(gef, existing_ezdxf=drawing, use_corrected_depth=layout.get('use_corrected_depth', False),
+                    compact=layout.get('compact', False))
+    graph.set_base_of_origin(*origin)
+    depth_factor = layout.get('depth_factor', 1)
+    for panel in layout['panels']:
+        i_kol = panel_column(gef, panel)
+        if i_kol is None:
+            continue
+        graph.draw_graph_line(i_kol=i_kol, value_factor=panel['value_factor'], depth_factor=depth_factor,
+                              place_left=panel.get('place_left', False), color=panel.get('color', 0),
+                              max_value=panel['max_value'], simplify_tolerance=layout.get('simplify_tolerance'))
+        graph.draw_horizontal_ax(i_kol=i_kol, max_value=panel['max_value'], offset_value=panel['offset_value'],
+                                 value_factor=panel['value_factor'], place_left=panel.get('place_left', False),
+                                 place_bottom=panel.get('place_bottom', False), depth_factor=depth_factor)
+    graph.draw_vertical_ax(depth_factor=depth_factor, offset_value=layout.get('depth_offset', 1))
+    if layout.get('raster'):
+        graph.draw_raster(value_factor=layout['raster']['value_factor'],
+                          offset_value=layout['raster']['offset_value'])
+    return graph
+
+
+def _max_depth(gef, layout):
+    """
+    Return the largest depth of a GEF file in the depth column used by render_gef, ignoring missing
+    values (COLUMNVOID); 0 if the file has no depths.
+    """
+    depth_col = gef.quantity_columns.get(11, 1) if layout.get('use_corrected_depth', False) else 1
+    depths = gef.get_column_values(depth_col)
+    if depths is None:  # column not in the data block
+        return 0
+    depths = depths[np.isfinite(depths)]
+    return max(float(depths.max()), 0) if len(depths) else 0
+
+
+def _render_file(args):
+    """Worker: read one GEF file, render it and save it as DXF. Returns (path, dxf path, error)."""
+    path, output_dir, layout = args
+    try:
+        gef = Gef2Open.Gef2OpenClass(verbose=False)
+        if not gef.read_gef(path, columnar=Gef2Open.np is not None):
+            return path, None, gef.fout
+        dxf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + '.dxf')
+        render_gef(gef, layout).save_drawing(dxf_path)
+        return path, dxf_path, None
+    except Exception as e:
+        return path, None, '{}: {}'.format(type(e).__name__, e)
+
+
+def gef_paths(paths):
+    """
+    Return a sorted list of GEF files from a directory name or a list of file names.
+    :param paths: directory or list of paths
+    """
+    if isinstance(paths, basestring):
+        return sorted(os.path.join(paths, name) for name in os.listdir(paths) if name.lower().endswith('.gef'))
+    return list(paths)
+
+
+def render_batch(paths, output, layout=None, workers=None, tile=False, tile_columns=10, tile_spacing=2.0,
+                 verbose=False):
+    """
+    Render many GEF files with one layout.
+    Without tiling every GEF file is read, rendered and saved as its own DXF in a worker process.
+    With tiling the GEF files are read in parallel and rendered into a single drawing, placed on a grid
+    using set_base_of_origin.
+    :param paths: directory with GEF files or a list of GEF paths
+    :param output: output directory (one DXF per file) or DXF file name (tile=True)
+    :param layout: layout dictionary, see DEFAULT_LAYOUT
+    :param workers: number of worker processes, default the number of CPUs; 1 renders in this process
+    :param tile: render all files into one drawing
+    :param tile_columns: number of soundings per row of tiles
+    :param tile_spacing: free space between tiles in map units
+    :param verbose: print a line with the number of files, duration and number of errors
+    :return: list of (path, dxf path, error) per GEF file
+    """
+    if layout is None:
+        layout = DEFAULT_LAYOUT
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    paths = gef_paths(paths)
+    t0 = time.time()
+
+    if not tile:
+        if not os.path.isdir(output):
+            os.makedirs(output)
+        tasks = [(path, output, layout) for path in paths]
+        if workers <= 1:
+            results = map(_render_file, tasks)
+        else:
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.map(_render_file, tasks, chunksize=4)
+            finally:
+                pool.close()
+                pool.join()
+    else:
+        results = []
+        gefs = []
+        for result in Gef2Open.read_gef_many(paths, workers=workers):
+            if result.gef is None:
+                results.append((result.pad, None, result.fout))
+            else:
+                gefs.append(result)
+        left, right = layout_extent(layout)
+        tile_width = left + right + tile_spacing
+        depths = [_max_depth(result.gef, layout) for result in gefs] or [0]
+        tile_height = max(depths) * layout.get('depth_factor', 1) + tile_spacing
+        drawing = ezdxf.new(dxfversion='AC1024')
+        for number, result in enumerate(gefs):
+            origin = (left + (number % tile_columns) * tile_width, -(number // tile_columns) * tile_height)
+            try:
+                render_gef(result.gef, layout, drawing=drawing, origin=origin)
+                results.append((result.pad, output, None))
+            except Exception as e:
+                results.append((result.pad, None, '{}: {}'.format(type(e).__name__, e)))
+        drawing.saveas(output)
+
+    if verbose:
+        duration = time.time() - t0
+        errors = sum(1 for result in results if result[2] is not None)
+        print 'render_batch: {} files in {:.2f} s ({:.1f} files/s, {} workers), {} errors'.format(
+            len(results), duration, len(results) / duration if duration > 0 else 0, workers, errors)
+    return results
+
+
+if __name__ == '__main__':
+    # Render all GEF files in a directory: python Gef2DXFBatch.py <gef dir> <output dir> [tile.dxf]
+    import sys
+    render_batch(sys.argv[1], sys.argv[2], workers=None, verbose=True)
+    if len(sys.argv) > 3:
+        render_batch(sys.argv[1], sys.argv[3], tile=True, verbose=True)
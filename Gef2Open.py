@@ -4,8 +4,36 @@
 
 import re
 import os
+import hashlib
 import traceback
 import sys
+import mmap
+import time
+import multiprocessing
+import cPickle
+from collections import namedtuple
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy is alleen nodig voor read_gef(..., columnar=True)
+    np = None
+
+# Keywords die meerdere keren voorkomen, genummerd met de eerste waarde
+MULTIPARS = ['COLUMNINFO', 'COLUMNVOID', 'MEASUREMENTTEXT', 'MEASUREMENTVAR', 'SPECIMENVAR', 'SPECIMENTEXT']
+
+# Headerregel: '#KEYWORD= waarde, waarde, ...' -> (keyword, waarden)
+_HEADERREGEL = re.compile(r'#([^ \t=]*)[ \t]*(?:=(.*))?$')
+# Scheiding tussen waarden in een headerregel, inclusief omringende witruimte
+_SCHEIDING = re.compile(r'[ \t]*,[ \t]*')
+# Keywords waarvan de waarde zelf een scheidingsteken is (en dus niet op ',' gesplitst mag worden)
+TEKENPARS = ['COLUMNSEPARATOR', 'RECORDSEPARATOR']
+# Grootte (bytes) van de mmap vensters waarin read_gef_mmap het data blok verwerkt,
+# een veelvoud van mmap.ALLOCATIONGRANULARITY
+MMAP_BLOK = 1 << 20
+# Veldbeschrijving in een Fortran-achtig #DATAFORMAT, bv. '(F7.2,2X,5F10.3)'
+_VELDFORMAAT = re.compile(r'(\d*)([A-Za-z])(\d*)(?:\.\d+)?')
+
 
 # Hulpfuncties
 def is_number(s):
@@ -16,12 +44,255 @@ def is_number(s):
         return False
 
 
+def _naar_getal(s):
+    try:
+        return float(s)
+    except ValueError:
+        return s
+
+
+def _naar_float(s):
+    try:
+        return float(s)
+    except ValueError:
+        return float('nan')
+
+
+def kolombreedtes(dataformat):
+    """
+    Leidt de kolomposities af uit een Fortran-achtig #DATAFORMAT, bv. '(F7.2,F9.3)' of '(6F10.3)'.
+    Velden 'nX' slaan n tekens over.
+    :param dataformat: waarde van #DATAFORMAT
+    :return: lijst met (begin, eind) per kolom, of None als dataformat geen vaste breedtes geeft
+    """
+    if not dataformat or not dataformat.startswith('('):
+        return None
+    velden = []
+    positie = 0
+    for aantal, soort, breedte in _VELDFORMAAT.findall(dataformat):
+        aantal = int(aantal) if aantal else 1
+        if soort in 'Xx':
+            positie += aantal
+        elif breedte:
+            for i in range(aantal):
+                velden.append((positie, positie + int(breedte)))
+                positie += int(breedte)
+    return velden or None
+
+
+def maak_rijsplitser(columnseparator=None, recordseparator=None, dataformat=None):
+    """
+    Kiest een gespecialiseerde functie die een dataregel in cellen splitst:
+    op een enkel scheidingsteken (#COLUMNSEPARATOR), op vaste kolombreedtes (#DATAFORMAT)
+    of op witruimte. Een afsluitend #RECORDSEPARATOR teken wordt verwijderd.
+    :param columnseparator: scheidingsteken tussen kolommen, None of witruimte voor witruimte
+    :param recordseparator: teken aan het einde van elke dataregel, of None
+    :param dataformat: waarde van #DATAFORMAT, bv. 'ASCII' of '(F7.2,F9.3)'
+    :return: functie die een regel omzet in een lijst met cellen (leeg voor een lege regel)
+    """
+    rs = recordseparator.strip() if recordseparator else ''
+    cs = columnseparator if columnseparator and columnseparator.strip() else None
+    velden = None if cs else kolombreedtes(dataformat)
+
+    if cs is not None:
+        def splits(line):
+            line = line.rstrip()
+            if rs and line.endswith(rs):
+                line = line[:-len(rs)].rstrip()
+            if not line:
+                return []
+            cellen = line.split(cs)
+            if not cellen[-1].strip():  # scheidingsteken voor het recordseparator teken
+                cellen.pop()
+            return cellen
+    elif velden is not None:
+        def splits(line):
+            line = line.rstrip()
+            if rs and line.endswith(rs):
+                line = line[:-len(rs)]
+            if not line.strip():
+                return []
+            return [line[begin:eind] for begin, eind in velden]
+    elif rs:
+        def splits(line):
+            cellen = line.split()
+            if cellen and cellen[-1].endswith(rs):
+                laatste = cellen.pop()[:-len(rs)]
+                if laatste:
+                    cellen.append(laatste)
+            return cellen
+    else:
+        splits = str.split
+    return splits
+
+
+def _mmap_vensters(f, begin, einde):
+    """
+    Genereert opeenvolgende mmap vensters van maximaal MMAP_BLOK bytes over bestand f van begin tot einde.
+    Elk venster wordt gesloten zodra de volgende wordt opgevraagd.
+    :return: generator van (venster, start) waarbij start de positie van begin binnen het eerste venster is
+    """
+    positie = begin - begin % mmap.ALLOCATIONGRANULARITY
+    while positie < einde:
+        venster = mmap.mmap(f.fileno(), min(MMAP_BLOK, einde - positie), access=mmap.ACCESS_READ,
+                            offset=positie)
+        try:
+            yield venster, max(begin - positie, 0)
+        finally:
+            venster.close()
+        positie += MMAP_BLOK
+
+
+def _mmap_stukken(f, begin, einde):
+    """Genereert de bytes van begin tot einde in stukken die op een regeleinde eindigen."""
+    rest = ''
+    for venster, start in _mmap_vensters(f, begin, einde):
+        laatste = venster.rfind('\n', start)
+        if laatste == -1:
+            rest += venster[start:]
+        else:
+            yield rest + venster[start:laatste + 1]
+            rest = venster[laatste + 1:]
+    if rest:
+        yield rest
+
+
 def removetrailers(string):
     d = re.sub('^[\t|\ ]*', '', string)
     e = re.sub('\r\n$', '', d)
     return e
 
 
+def _foutmelding():
+    """Geeft de actuele exceptie als korte tekst, bv. 'ValueError: ...'."""
+    soort, waarde = sys.exc_info()[:2]
+    return '%s: %s' % (soort.__name__, waarde)
+
+
+# Foutafhandeling
+# Zonder strict geven de accessors een Foutwaarde: een str gelijk aan de oude tekst ('Error:MissingKeyword'),
+# te herkennen met is_fout zonder de tekst te doorzoeken. Met strict=True een exceptie uit FOUTSOORTEN.
+class GefError(Exception):
+    """Basis voor alle fouten van Gef2Open; code is de foutcode, bv. 'MissingKeyword'."""
+
+    def __init__(self, code, bron=None, bestand=None):
+        Exception.__init__(self, code, bron, bestand)
+        self.code = code
+        self.bron = bron
+        self.bestand = bestand
+
+    def __str__(self):
+        tekst = self.code if self.bron is None else '{}: {}'.format(self.code, self.bron)
+        return tekst if self.bestand is None else '{} ({})'.format(tekst, self.bestand)
+
+
+class GefMissingKeyword(GefError):
+    pass
+
+
+class GefMissingValue(GefError):
+    pass
+
+
+class GefMissingIndex(GefError):
+    pass
+
+
+class GefMissingColumn(GefError):
+    pass
+
+
+class GefMissingData(GefError):
+    pass
+
+
+class GefUnknownAspect(GefError):
+    pass
+
+
+class GefReadError(GefError):
+    pass
+
+
+class GefNotCPT(GefError):
+    pass
+
+
+# Foutcode -> exceptie
+FOUTSOORTEN = {
+    'MissingKeyword': GefMissingKeyword,
+    'MissingValue': GefMissingValue,
+    'MissingIndex': GefMissingIndex,
+    'MissingKol': GefMissingColumn,
+    'MissingQuantity': GefMissingColumn,
+    'MissingRij': GefMissingData,
+    'MissingDatablok': GefMissingData,
+    'UnknownAspect': GefUnknownAspect,
+    'ReadError': GefReadError,
+    'GeenCPT': GefNotCPT,
+}
+
+
+class Foutwaarde(str):
+    """Resultaat van een accessor bij een fout: gelijk aan de foutmelding als tekst, met de code apart."""
+    __slots__ = ()
+
+    @property
+    def code(self):
+        return self.split(':')[-1]
+
+
+# Gedeelde Foutwaarde objecten per tekst
+_FOUTWAARDEN = {}
+
+
+def is_fout(waarde):
+    """Of een resultaat van een accessor een fout is (zonder strict)."""
+    return isinstance(waarde, Foutwaarde)
+
+
+class GefDiagnostics(object):
+    """
+    Verzamelt de fouten van een of meer Gef2OpenClass objecten per bestand, om ze over veel bestanden
+    te tellen en de bestanden met fouten op te zoeken. Per bestand worden maximaal max_per_bestand
+    fouten bewaard, de tellers per code tellen alles.
+    """
+
+    def __init__(self, max_per_bestand=100):
+        self.max_per_bestand = max_per_bestand
+        self.tellers = {}  # code -> aantal
+        self.bestanden = {}  # pad -> lijst met (code, bron)
+
+    def add(self, pad, code, bron=None):
+        self.tellers[code] = self.tellers.get(code, 0) + 1
+        fouten = self.bestanden.setdefault(pad, [])
+        if len(fouten) < self.max_per_bestand:
+            fouten.append((code, bron))
+
+    def __len__(self):
+        return len(self.bestanden)
+
+    def files(self, code=None):
+        """Gesorteerde lijst met bestanden met fouten, of met een bepaalde foutcode."""
+        return sorted(pad for pad, fouten in self.bestanden.iteritems()
+                      if code is None or [1 for c, bron in fouten if c == code])
+
+    def merge(self, andere):
+        """Voegt de fouten van een andere GefDiagnostics toe, bv. uit een ander proces."""
+        for code, aantal in andere.tellers.iteritems():
+            self.tellers[code] = self.tellers.get(code, 0) + aantal
+        for pad, fouten in andere.bestanden.iteritems():
+            eigen = self.bestanden.setdefault(pad, [])
+            eigen.extend(fouten[:self.max_per_bestand - len(eigen)])
+
+    def report(self):
+        """Samenvatting als tekst: per foutcode het aantal fouten en bestanden."""
+        regels = ['{} bestanden met fouten'.format(len(self.bestanden))]
+        for code, aantal in sorted(self.tellers.iteritems(), key=lambda item: -item[1]):
+            regels.append('{:<16} {:>8} fouten {:>8} bestanden'.format(code, aantal, len(self.files(code))))
+        return '\n'.join(regels)
+
+
 def Traceback():
     """"Returns error messages and prints them."""
 
@@ -31,201 +302,582 @@ def Traceback():
     print pymsg
 
 
+# Gedeelde float objecten voor veel voorkomende gehele waarden in headers (nummers, vlaggen, quantity numbers)
+_GEHELE_GETALLEN = dict((float(i), float(i)) for i in range(-1, 1025))
+
+
+def _deel(waarde):
+    """Geeft een gedeeld object voor een headerwaarde: strings worden ge-intern-d, kleine gehele floats gedeeld."""
+    if isinstance(waarde, str):
+        return intern(waarde)
+    if isinstance(waarde, float) and waarde in _GEHELE_GETALLEN and (waarde != 0 or str(waarde)[0] != '-'):
+        return _GEHELE_GETALLEN[waarde]
+    return waarde
+
+
+class _Tabel(object):
+    """
+    Compacte vervanging van een dict {nummer: [waarden]} voor keywords uit MULTIPARS:
+    de nummers staan in een array, de waarden per nummer in een tuple met gedeelde objecten.
+    Opvragen geeft (net als de dict) een list; een ontbrekend nummer geeft een KeyError.
+    """
+    __slots__ = ('sleutels', 'rijen')
+
+    def __init__(self, items):
+        items = sorted(items)
+        sleutels = [sleutel for sleutel, rij in items]
+        if all(isinstance(sleutel, int) for sleutel in sleutels):
+            self.sleutels = array('l', sleutels)
+        else:
+            self.sleutels = tuple(sleutels)
+        self.rijen = tuple(tuple(_deel(w) for w in rij) for sleutel, rij in items)
+
+    def __len__(self):
+        return len(self.rijen)
+
+    def __contains__(self, sleutel):
+        try:
+            self.sleutels.index(sleutel)
+        except (ValueError, TypeError):
+            return False
+        return True
+
+    def __getitem__(self, sleutel):
+        try:
+            return list(self.rijen[self.sleutels.index(sleutel)])
+        except (ValueError, TypeError):
+            raise KeyError(sleutel)
+
+    def get(self, sleutel, standaard=None):
+        try:
+            return self[sleutel]
+        except KeyError:
+            return standaard
+
+    def items(self):
+        return [(sleutel, list(rij)) for sleutel, rij in zip(self.sleutels, self.rijen)]
+
+    def __getstate__(self):
+        return self.sleutels, self.rijen
+
+    def __setstate__(self, state):
+        self.sleutels, self.rijen = state
+
+
+class GefHeader(object):
+    """
+    Compact, getypeerd model van een gef header, een keer opgebouwd bij het inlezen.
+    De vaste keywords zijn velden met een tuple van waarden (of None als het keyword ontbreekt),
+    COLUMNINFO, COLUMNVOID, MEASUREMENTTEXT en MEASUREMENTVAR zijn _Tabel objecten.
+    Alle overige keywords staan in 'overig'. Strings worden ge-intern-d, zodat veel headers tegelijk
+    in geheugen gehouden kunnen worden (bv. voor een index); naar_headerdict geeft de oude vorm terug.
+    """
+    VELDEN = ('COLUMN', 'LASTSCAN', 'COMPANYID', 'TESTID', 'PARENT', 'PROCEDURECODE', 'PROJECTID', 'REPORTCODE',
+              'STARTDATE', 'XYID', 'ZID')
+    TABELLEN = ('COLUMNINFO', 'COLUMNVOID', 'MEASUREMENTTEXT', 'MEASUREMENTVAR')
+    __slots__ = tuple(veld.lower() for veld in VELDEN + TABELLEN) + ('overig',)
+
+    def __init__(self, headerdict=None):
+        """
+        :param headerdict: dictionary zoals opgebouwd door Gef2OpenClass._lees_header, None voor een lege header
+        """
+        if headerdict is None:
+            headerdict = {}
+        for veld in self.VELDEN:
+            waarden = headerdict.get(veld)
+            setattr(self, veld.lower(), None if waarden is None else tuple(_deel(w) for w in waarden))
+        for veld in self.TABELLEN:
+            waarden = headerdict.get(veld)
+            setattr(self, veld.lower(), None if waarden is None else _Tabel(waarden.iteritems()))
+        overig = {}
+        for par, waarden in headerdict.iteritems():
+            if par in self.VELDEN or par in self.TABELLEN or par in ('datablok', 'EOH'):
+                continue
+            if isinstance(waarden, dict):
+                overig[intern(par)] = _Tabel(waarden.iteritems())
+            else:
+                overig[intern(par)] = tuple(_deel(w) for w in waarden)
+        self.overig = overig
+
+    def get(self, par, standaard=None):
+        """Geeft de waarden van een keyword (tuple, of _Tabel voor MULTIPARS), of standaard als het ontbreekt."""
+        if par in self.VELDEN or par in self.TABELLEN:
+            waarden = getattr(self, par.lower())
+        else:
+            waarden = self.overig.get(par)
+        return standaard if waarden is None else waarden
+
+    def __contains__(self, par):
+        return self.get(par) is not None
+
+    def naar_headerdict(self):
+        """Geeft de header terug als dictionary in de vorm van Gef2OpenClass.headerdict (zonder data blok)."""
+        headerdict = {}
+        for par in self.VELDEN + self.TABELLEN:
+            waarden = getattr(self, par.lower())
+            if waarden is not None:
+                headerdict[par] = dict(waarden.items()) if isinstance(waarden, _Tabel) else list(waarden)
+        for par, waarden in self.overig.iteritems():
+            headerdict[par] = dict(waarden.items()) if isinstance(waarden, _Tabel) else list(waarden)
+        return headerdict
+
+    def __getstate__(self):
+        return tuple(getattr(self, veld) for veld in self.__slots__)
+
+    def __setstate__(self, state):
+        for veld, waarde in zip(self.__slots__, state):
+            setattr(self, veld, waarde)
+
+    # Getypeerde waarden, None als het keyword of de waarde ontbreekt
+
+    def _getal(self, veld, index):
+        waarden = getattr(self, veld)
+        if waarden is not None and len(waarden) > index and isinstance(waarden[index], float):
+            return waarden[index]
+        return None
+
+    @property
+    def x(self):
+        return self._getal('xyid', 1)
+
+    @property
+    def y(self):
+        return self._getal('xyid', 2)
+
+    @property
+    def z(self):
+        return self._getal('zid', 1)
+
+
+# Afgeleide sondeerparameters (Robertson, 2009)
+PA = 0.1  # atmosferische druk in MPa
+GAMMA_WATER = 9.81  # volumiek gewicht water in kN/m3
+
+
+def cpt_parameters(diepte, qc, fs, u2=None, area_ratio=1.0, unit_weight=18.0, groundwater_depth=1.0,
+                   max_iteraties=30):
+    """
+    Berekent afgeleide sondeerparameters voor een hele sondering in numpy array bewerkingen.
+    Spanningen worden berekend met een constant volumiek gewicht en een hydrostatische waterspanning.
+    Ontbrekende waarden (NaN) en niet zinvolle waarden (bv. qt <= sigma_v0) geven NaN.
+    :param diepte: array met diepte in m (positief naar beneden)
+    :param qc: array met conusweerstand in MPa
+    :param fs: array met plaatselijke wrijving in MPa
+    :param u2: array met waterspanning achter de conus in MPa, None als niet gemeten
+    :param area_ratio: netto oppervlaktequotient van de conuspunt (a)
+    :param unit_weight: volumiek gewicht van de grond in kN/m3
+    :param groundwater_depth: diepte van de grondwaterstand in m
+    :param max_iteraties: maximaal aantal iteraties voor de spanningsexponent n van Qtn
+    :return: dict met arrays: qt, Rf (%), sigma_v0, u0, sigma_v0_eff (MPa), Fr (%), Qtn, n en Ic
+    """
+    diepte = np.asarray(diepte, dtype=np.float64)
+    qc = np.asarray(qc, dtype=np.float64)
+    fs = np.asarray(fs, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if u2 is None:
+            qt = qc.copy()
+        else:
+            qt = qc + np.asarray(u2, dtype=np.float64) * (1 - area_ratio)
+        rf = fs / qc * 100
+        dz = np.diff(np.concatenate(([0.0], np.maximum(diepte, 0))))
+        sigma_v0 = np.cumsum(unit_weight * np.maximum(dz, 0)) / 1000
+        u0 = GAMMA_WATER * np.maximum(diepte - groundwater_depth, 0) / 1000
+        sigma_v0_eff = sigma_v0 - u0
+        netto = qt - sigma_v0
+        netto[netto <= 0] = np.nan
+        fr = fs / netto * 100
+        fr[fr <= 0] = np.nan
+        sigma_v0_eff[sigma_v0_eff <= 0] = np.nan
+
+        n = np.ones(len(qt))
+        for iteratie in range(max_iteraties):
+            qtn = netto / PA * (PA / sigma_v0_eff) ** n
+            qtn[qtn <= 0] = np.nan
+            ic = np.sqrt((3.47 - np.log10(qtn)) ** 2 + (np.log10(fr) + 1.22) ** 2)
+            n_nieuw = np.minimum(0.381 * ic + 0.05 * sigma_v0_eff / PA - 0.15, 1.0)
+            n_nieuw = np.where(np.isnan(n_nieuw), n, n_nieuw)
+            verschil = np.abs(n_nieuw - n)
+            n = n_nieuw
+            if not verschil.size or verschil.max() < 1e-3:
+                break
+        qtn = netto / PA * (PA / sigma_v0_eff) ** n
+        qtn[qtn <= 0] = np.nan
+        ic = np.sqrt((3.47 - np.log10(qtn)) ** 2 + (np.log10(fr) + 1.22) ** 2)
+    return {'qt': qt, 'Rf': rf, 'sigma_v0': sigma_v0, 'u0': u0, 'sigma_v0_eff': sigma_v0_eff, 'Fr': fr,
+            'Qtn': qtn, 'n': n, 'Ic': ic}
+
+
+# Statistieken voor get_aggregated en resample_many
+STATISTIEKEN = ('mean', 'min', 'max', 'median', 'percentile', 'count')
+
+
+def _intervallen(intervals):
+    """Zet een lijst grenzen [d0, d1, ...] of een lijst (boven, onder) paren om naar twee arrays."""
+    intervals = np.asarray(intervals, dtype=np.float64)
+    if intervals.ndim == 1:
+        return intervals[:-1], intervals[1:]
+    return intervals[:, 0], intervals[:, 1]
+
+
+def _diepte_waarden(diepte, waarden):
+    """Geeft diepte en waarden zonder NaN rijen, gesorteerd op diepte."""
+    diepte = np.asarray(diepte, dtype=np.float64)
+    waarden = np.asarray(waarden, dtype=np.float64)
+    geldig = ~(np.isnan(diepte) | np.isnan(waarden))
+    diepte = diepte[geldig]
+    waarden = waarden[geldig]
+    volgorde = np.argsort(diepte, kind='mergesort')
+    return diepte[volgorde], waarden[volgorde]
+
+
+def interpoleer(diepte, waarden, depths):
+    """
+    Interpoleert waarden lineair naar de gegeven diepten; buiten het gemeten traject NaN.
+    :param diepte: array met de diepte per scan
+    :param waarden: array met de waarden per scan (NaN wordt overgeslagen)
+    :param depths: diepten waarop geinterpoleerd wordt
+    """
+    diepte, waarden = _diepte_waarden(diepte, waarden)
+    depths = np.asarray(depths, dtype=np.float64)
+    if not len(diepte):
+        return np.full(depths.shape, np.nan)
+    return np.interp(depths, diepte, waarden, left=np.nan, right=np.nan)
+
+
+def aggregeer(diepte, waarden, intervals, statistic='mean', percentile=50):
+    """
+    Aggregeert waarden per diepte interval [boven, onder). Gemiddelde, minimum, maximum en aantal worden
+    voor alle intervallen tegelijk berekend (cumulatieve som en reduceat); mediaan en percentiel per interval.
+    :param diepte: array met de diepte per scan
+    :param waarden: array met de waarden per scan (NaN wordt overgeslagen)
+    :param intervals: grenzen [d0, d1, ...] of lijst met (boven, onder) paren
+    :param statistic: een van STATISTIEKEN
+    :param percentile: percentiel (0-100) voor statistic='percentile'
+    :return: array met een waarde per interval, NaN voor intervallen zonder waarden
+    """
+    if statistic not in STATISTIEKEN:
+        raise ValueError('Onbekende statistiek: {}'.format(statistic))
+    diepte, waarden = _diepte_waarden(diepte, waarden)
+    boven, onder = _intervallen(intervals)
+    lo = np.searchsorted(diepte, boven, side='left')
+    hi = np.maximum(np.searchsorted(diepte, onder, side='left'), lo)
+    aantal = hi - lo
+    if statistic == 'count':
+        return aantal.astype(np.float64)
+    leeg = aantal == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if statistic == 'mean':
+            som = np.concatenate(([0.0], np.cumsum(waarden)))
+            uit = (som[hi] - som[lo]) / aantal
+        elif statistic in ('min', 'max'):
+            functie = np.minimum if statistic == 'min' else np.maximum
+            grenzen = np.column_stack((lo, hi)).ravel()
+            # extra element zodat ook hi == len(waarden) een geldige index voor reduceat is
+            uit = functie.reduceat(np.append(waarden, np.nan), grenzen)[::2] if len(grenzen) else np.empty(0)
+        else:
+            p = 50 if statistic == 'median' else percentile
+            uit = np.array([np.percentile(waarden[a:b], p) if b > a else np.nan for a, b in zip(lo, hi)])
+    uit = np.asarray(uit, dtype=np.float64)
+    uit[leeg] = np.nan
+    return uit
+
+
+# Melding van de validator: niveau ('fout' of 'waarschuwing'), aspect, code, omschrijving en regelnummer (of None)
+GefMelding = namedtuple('GefMelding', ['niveau', 'aspect', 'code', 'tekst', 'regel'])
+
+# Aspecten voor test_gef en validate
+ASPECTEN = ('HEADER', 'DATA', 'GEF-CPT-Report', 'GEF-BORE-Report')
+# Verplichte keywords en kolommen (quantity numbers) per aspect
+VERPLICHTE_KEYWORDS = {
+    'HEADER': ('GEFID', 'COLUMN', 'COLUMNINFO'),
+    'GEF-CPT-Report': ('XYID', 'ZID', 'LASTSCAN'),
+    'GEF-BORE-Report': ('XYID', 'ZID', 'LASTSCAN'),
+}
+VERPLICHTE_KOLOMMEN = {
+    'GEF-CPT-Report': (1, 2),  # sondeertrajectlengte, conusweerstand
+    'GEF-BORE-Report': (1, 2),  # bovenkant en onderkant laag
+}
+# Maximaal aantal meldingen per code voor dataregels
+MAX_MELDINGEN = 10
+# Tekens die voor np.fromstring(..., sep=' ') getallen scheiden: tab, nieuwe regel, CR en spatie
+_WITRUIMTE = np.in1d(np.arange(256), (9, 10, 13, 32)) if np is not None else None
+
+
+def _woorden_per_regel(tekst):
+    """Geeft een int array met het aantal door witruimte gescheiden woorden op elke regel van tekst."""
+    codes = np.frombuffer(tekst, dtype=np.uint8)
+    wit = _WITRUIMTE[codes]
+    begin = ~wit
+    begin[1:] &= wit[:-1]
+    regels = np.flatnonzero(codes == 10) + 1
+    regels = np.concatenate(([0], regels[regels < len(codes)]))
+    return np.add.reduceat(begin, regels, dtype=np.int32)
+
+
+# Tekst tussen enkele quotes in een dataregel
+_TEKST = re.compile(r"'([^']*)'")
+
+
+def _cellen_en_teksten(line, splits, n_kol, rs=''):
+    """
+    Splitst een dataregel in de cellen met waarden en de teksten (bv. de codes van een boring): teksten staan
+    tussen enkele quotes en blijven heel, ook met een scheidingsteken erin; zonder quotes zijn de cellen achter
+    de n_kol kolommen van #COLUMN de teksten.
+    :param splits: splitsfunctie, zie maak_rijsplitser
+    :param rs: #RECORDSEPARATOR, wordt achter de laatste tekst verwijderd
+    :return: (lijst met cellen, lijst met teksten)
+    """
+    quote = line.find("'")
+    if quote == -1:
+        cellen = splits(line)
+        return cellen[:n_kol or None], [cel.strip() for cel in cellen[n_kol:]] if n_kol else []
+    return splits(line[:quote]), _TEKST.findall(line[quote:].rstrip().rstrip(rs))
+
+
+def _stukken(f, blok=MMAP_BLOK):
+    """Leest een bestand vanaf de huidige positie in stukken die op een regeleinde eindigen."""
+    rest = ''
+    while True:
+        data = f.read(blok)
+        if not data:
+            break
+        laatste = data.rfind('\n')
+        if laatste == -1:
+            rest += data
+        else:
+            yield rest + data[:laatste + 1]
+            rest = data[laatste + 1:]
+    if rest:
+        yield rest
+
+
 class Gef2OpenClass:
-    def __init__(self):
-        print "init"
+    def __init__(self, cache=None, strict=False, diagnostics=None, verbose=True):
+        """
+        :param cache: GefCache voor ingelezen bestanden, standaard STANDAARD_CACHE; False voor geen cache
+        :param strict: fouten als exceptie (GefError) in plaats van een Foutwaarde of False
+        :param diagnostics: GefDiagnostics die alle fouten verzamelt, None voor geen
+        :param verbose: meldingen en tracebacks printen
+        """
+        self.strict = strict
+        self.diagnostics = diagnostics
+        self.verbose = verbose
+        if verbose:
+            print "init"
+        if cache is None:
+            cache = STANDAARD_CACHE
+        self.cache = cache or None
+        self._cache_sleutel = None
+        self.datablok = None  # dict rijnummer (vanaf 1) -> lijst met waarden, na #EOH zonder columnar
+        self.datablok_array = None
+        self._bestand = None
+        self._data_offset = None  # byte positie van het nog niet ingelezen data blok
+        self.data_offset = None  # byte positie van de eerste dataregel, None zolang #EOH niet gelezen is
+        self._columnar = False
+        self.fout = None  # omschrijving van de laatste fout bij het inlezen
+        self.header = GefHeader()  # compact model van de header, opgebouwd bij het inlezen
+        self.quantity_columns = {}  # quantity number -> kolom nummer, opgebouwd bij het inlezen van de header
+        self._afgeleid = {}  # (opties) -> dict met afgeleide parameters, zie get_derived
+        self._leesfouten = {}  # foutcode -> [aspect, tekst, aantal], bij het inlezen gevonden, zie test_gef
+        self._volg_offset = None  # byte positie tot waar het data blok gevolgd is, zie open_tail
+        self._volg_buffer = None
+
+    def __getattr__(self, naam):
+        # headerdict wordt niet bij het inlezen opgebouwd (self.header is het model), maar voor bestaande code
+        # bij de eerste keer opvragen uit self.header afgeleid, met 'EOH' en 'datablok' als #EOH gelezen is, en
+        # tot het volgende read_gef bewaard. Wijzigingen in headerdict komen niet in self.header en de accessors;
+        # in columnar modus staat het data blok in datablok_array en is headerdict['datablok'] leeg.
+        if naam == 'headerdict':
+            headerdict = self.header.naar_headerdict()
+            if self.datablok is not None:
+                headerdict['EOH'] = {}
+                headerdict['datablok'] = self.datablok
+            self.__dict__['headerdict'] = headerdict
+            return headerdict
+        raise AttributeError(naam)
+
+    def _fout(self, code, bron=None, tekst=None):
+        """
+        Handelt een fout van een accessor af: registreren in self.diagnostics en met strict een exceptie,
+        anders de Foutwaarde.
+        :param code: foutcode, zie FOUTSOORTEN
+        :param bron: keyword, kolom of index waar de fout bij hoort
+        :param tekst: teruggegeven tekst, standaard 'Error:' + code
+        """
+        if self.diagnostics is not None:
+            self.diagnostics.add(self._bestand, code, bron)
+        if self.strict:
+            raise FOUTSOORTEN.get(code, GefError)(code, bron, self._bestand)
+        if tekst is None:
+            tekst = 'Error:' + code
+        waarde = _FOUTWAARDEN.get(tekst)
+        if waarde is None:
+            waarde = _FOUTWAARDEN[tekst] = Foutwaarde(tekst)
+        return waarde
+
+    def _leesfout(self, melding, met_traceback=True):
+        """Handelt een fout bij het inlezen af (zie _fout) en geeft False."""
+        self.fout = _foutmelding()
+        if self.diagnostics is not None:
+            self.diagnostics.add(self._bestand, 'ReadError', self.fout)
+        if self.strict:
+            raise GefReadError('ReadError', self.fout, self._bestand), None, sys.exc_info()[2]
+        if self.verbose:
+            print melding
+            if met_traceback:
+                Traceback()
+        return False
+
+    def _flag(self, veld, lengte=0):
+        """Of een vast keyword uit self.header aanwezig is met meer dan lengte waarden."""
+        waarden = getattr(self.header, veld)
+        return waarden is not None and len(waarden) > lengte
+
+    def _waarde(self, veld, index, lengte=0, omzetting=None):
+        """
+        Geeft waarde index van een vast keyword uit self.header, of een foutmelding als tekst.
+        :param veld: naam van het veld in GefHeader (keyword in kleine letters)
+        :param index: index van de gevraagde waarde
+        :param lengte: het keyword moet meer dan lengte waarden hebben, anders 'Error:MissingValue'
+        :param omzetting: functie die op de waarde wordt toegepast, bv. int
+        """
+        waarden = getattr(self.header, veld)
+        if waarden is None:
+            return self._fout('MissingKeyword', veld)
+        if len(waarden) > lengte:
+            if omzetting is not None:
+                return omzetting(waarden[index])
+            return waarden[index]
+        return self._fout('MissingValue', veld)
 
     # Purpose: Of een BORE-Report file is (boring)
     def gbr_is_gbr(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if 'GEF-BORE-Report' in self.headerdict['PROCEDURECODE']:
-                out = True
-            else:
-                out = False
-        else:
-            if 'REPORTCODE' in self.headerdict:
-                if 'GEF-BORE-Report' in self.headerdict['REPORTCODE']:
-                    out = True
-                else:
-                    out = False
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        if self.header.procedurecode is not None:
+            return 'GEF-BORE-Report' in self.header.procedurecode
+        if self.header.reportcode is not None:
+            return 'GEF-BORE-Report' in self.header.reportcode
+        return False
 
     # Purpose: Of een GEF-CPT-Report file is (sondering)
     def gcr_is_gcr(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if 'GEF-CPT-Report' in self.headerdict['PROCEDURECODE']:
-                out = True
-            else:
-                out = False
-        else:
-            if 'REPORTCODE' in self.headerdict:
-                if 'GEF-CPT-Report' in self.headerdict['REPORTCODE']:
-                    out = True
+        if self.header.procedurecode is not None:
+            return 'GEF-CPT-Report' in self.header.procedurecode
+        if self.header.reportcode is not None:
+            return 'GEF-CPT-Report' in self.header.reportcode
+        return False
+
+    # Purpose: Geeft het rapport type, bv. 'GEF-CPT-Report', volgens #PROCEDURECODE of anders #REPORTCODE
+    def get_report_type(self):
+        for veld in ('procedurecode', 'reportcode'):
+            waarden = getattr(self.header, veld)
+            if waarden:
+                return str(waarden[0])
+        return self._fout('MissingKeyword', 'PROCEDURECODE')
+
+    # Purpose: Geeft de waarden van een keyword als tekst zoals in het bestand, zonder omzetting naar getallen
+    def get_header_text(self, keyword):
+        """
+        Leest de header van het laatst ingelezen bestand opnieuw (tot data_offset) en geeft de waarden van een
+        keyword als teksten, zoals ze in het bestand staan; self.header bewaart getallen als float, bv. '1' als 1.0.
+        :param keyword: keyword zonder '#', bv. 'MEASUREMENTTEXT'
+        :return: lijst met teksten, voor keywords uit MULTIPARS een dict nummer -> lijst met teksten (met dezelfde
+                 sleutels als self.header); Foutwaarde 'Error:MissingKeyword' als het keyword ontbreekt
+        """
+        teksten = None
+        if self._bestand is not None:
+            f = open(self._bestand, 'rb')
+            try:
+                header = f.read(self.data_offset) if self.data_offset is not None else f.read()
+            finally:
+                f.close()
+            for line in header.splitlines():
+                m = _HEADERREGEL.match(line.lstrip(' \t'))
+                if m is None or m.group(1) != keyword or not m.group(2) or not m.group(2).lstrip(' \t'):
+                    continue
+                keyinfo = m.group(2).lstrip(' \t')
+                if keyword in TEKENPARS:
+                    teksten = [keyinfo.rstrip(' \t')]
+                    continue
+                b = _SCHEIDING.split(keyinfo)
+                waarden = [i.lstrip(' \t|') for i in b]
+                if keyword in MULTIPARS:
+                    nummer = _naar_getal(waarden[0])
+                    if teksten is None:
+                        teksten = {}
+                    teksten[int(nummer) if isinstance(nummer, float) else b[0]] = waarden
                 else:
-                    out = False
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+                    teksten = waarden
+        if teksten is None:
+            return self._fout('MissingKeyword', keyword)
+        return teksten
 
     # Purpose: Geeft aantal kolommen in het data block
     def get_column(self):
-        if 'COLUMN' in self.headerdict:
-            if len(self.headerdict['COLUMN']) > 0:
-                out = self.headerdict['COLUMN'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('column', 0)
 
     # Purpose: Of #COLUMN aanwezig
     def get_column_flag(self):
-        if ('COLUMN' in self.headerdict):
-            if len(self.headerdict['COLUMN']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('column')
 
     # Purpose: Geeft nodata waarde voor geselecteerde kolom
     def get_column_void(self, i_Kol):
-        if 'COLUMNVOID' in self.headerdict:
-            if len(self.headerdict['COLUMNVOID']) > i_Kol - 1:
-                out = self.headerdict['COLUMNVOID'][i_Kol][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        voids = self.header.columnvoid
+        if voids is None:
+            return self._fout('MissingKeyword', 'columnvoid')
+        if len(voids) > i_Kol - 1:
+            return voids[i_Kol][1]
+        return self._fout('MissingValue', 'columnvoid')
 
     # Purpose: Of #COLUMNVOID aanwezig
     def get_column_void_flag(self, i_Kol):
-        if 'COLUMNVOID' in self.headerdict:
-            if len(self.headerdict['COLUMNVOID']) > i_Kol - 1:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('columnvoid', i_Kol - 1)
 
     # Purpose: Geeft columninfo terug in een list
     def get_column_info(self, i_Kol):
-        if 'COLUMNINFO' in self.headerdict:
-            if len(self.headerdict['COLUMNINFO']) > i_Kol - 1:
-                out = self.headerdict['COLUMNINFO'][i_Kol]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        columninfo = self.header.columninfo
+        if columninfo is None:
+            return self._fout('MissingKeyword', 'columninfo')
+        if len(columninfo) > i_Kol - 1:
+            return columninfo[i_Kol]
+        return self._fout('MissingValue', 'columninfo')
 
     # Purpose: Of #COLUMNINFO aanwezig
     def get_column_info_flag(self, i_Kol):
-        if 'COLUMNINFO' in self.headerdict:
-            if len(self.headerdict['COLUMNINFO']) > i_Kol - 1:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('columninfo', i_Kol - 1)
 
     # Purpose: Of #COMPANYID aanwezig
     def get_companyid_flag(self):
-        if 'COMPANYID' in self.headerdict:
-            if len(self.headerdict['COMPANYID']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('companyid')
 
     # Purpose: Geeft company naam
     def get_companyid_Name(self):
-        if 'COMPANYID' in self.headerdict:
-            if len(self.headerdict['COMPANYID']) > 0:
-                out = self.headerdict['COMPANYID'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('companyid', 0)
 
     # Purpose: Of #TESTID aanwezig
     def get_testid_flag(self):
-        if 'TESTID' in self.headerdict:
-            if len(self.headerdict['TESTID']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('testid')
 
     # Purpose: Geeft testid naam
     def get_testid_name(self):
-        if 'TESTID' in self.headerdict:
-            if len(self.headerdict['TESTID']) > 0:
-                out = self.headerdict['TESTID'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('testid', 0)
 
     # Purpose: Geeft waarde uit bepaalde cel van data block
+    # Na read_gef(..., columnar=True) zijn nodata waarden NaN
     def get_data(self, i_Kol, iRij):
-        if 'datablok' in self.headerdict:
-            if iRij in self.headerdict['datablok']:
-                if len(self.headerdict['datablok'][iRij]) >= i_Kol - 1:
-                    out = self.headerdict['datablok'][iRij][i_Kol - 1]
+        if self._data_offset is not None:
+            self._laad_datablok()
+        if self.datablok_array is not None:
+            if 0 < iRij <= self.datablok_array.shape[0]:
+                if 0 < i_Kol <= self.datablok_array.shape[1]:
+                    out = self.datablok_array[iRij - 1, i_Kol - 1]
+                else:
+                    err = 'MissingKol'
+            else:
+                err = 'MissingRij'
+        elif self.datablok is not None:
+            if iRij in self.datablok:
+                if len(self.datablok[iRij]) >= i_Kol - 1:
+                    out = self.datablok[iRij][i_Kol - 1]
                 else:
                     err = 'MissingKol'
             else:
@@ -236,351 +888,385 @@ class Gef2OpenClass:
             return out
         except:
             # return None
-            return err
+            return self._fout(err, (i_Kol, iRij), err)
 
     # TODO continue get_data_iter
     # Purpose: geeft een iterator met alle waarden voor een bepaalde kolom in een data block
     def get_data_iter(self, i_Kol, depth_col=1):
+        if self._data_offset is not None:
+            self._laad_datablok()
         try:
-            if 'datablok' in self.headerdict:
-                if len(self.headerdict['datablok'][1]) >= i_Kol - 1:
-                    void = self.get_column_void(i_Kol)
-                    for i_Rij in range(1, 1 + int(self.get_nr_scans())):
-                        depth = self.get_data(depth_col, i_Rij)
-                        value = self.get_data(i_Kol, i_Rij)
-                        if value == void:  #Replace nodata value for None
+            if self.datablok_array is not None:
+                if 0 < i_Kol <= self.datablok_array.shape[1]:
+                    depths = self.datablok_array[:, depth_col - 1].tolist()
+                    values = self.datablok_array[:, i_Kol - 1].tolist()
+                    for depth, value in zip(depths, values):
+                        if value != value:  # NaN (nodata) vervangen door None
                             value = None
                         yield (depth, value)
                 else:
                     err = 'MissingKol'
+            elif self.datablok is not None:
+                datablok = self.datablok
+                if len(datablok) > 0 and len(datablok[1]) >= i_Kol - 1:
+                    void = self._void(i_Kol)
+                    for i_Rij in xrange(1, len(datablok) + 1):
+                        rij = datablok[i_Rij]
+                        value = rij[i_Kol - 1]
+                        if value == void:  #Replace nodata value for None
+                            value = None
+                        yield (rij[depth_col - 1], value)
+                else:
+                    err = 'MissingKol'
             else:
                 err = 'MissingDatablok'
         except:
-            yield err
+            yield self._fout(err, i_Kol, err)
 
-    # Purpose: Of gegeven #MEASUREMENTTEXT index aanwezig
-    def get_measurementtext_flag(self, i_Index):
-        if 'MEASUREMENTTEXT' in self.headerdict:
-            if i_Index in self.headerdict['MEASUREMENTTEXT']:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
+    # Purpose: Volgt een Gef bestand dat nog geschreven wordt (bv. tijdens het sonderen)
+    def open_tail(self, i_sBestandGef, columnar=False):
+        """
+        Leest de header van een gef bestand dat nog aangevuld wordt en onthoudt de byte positie van het
+        data blok. Daarna leest poll_tail steeds alleen de nieuw toegevoegde, volledige dataregels.
+        :param i_sBestandGef: pad naar het gef bestand
+        :param columnar: het data blok als groeiende numpy array in self.datablok_array bijhouden
+        :return: True als de header compleet is (#EOH gevonden), anders False (later opnieuw proberen)
+        """
+        if columnar and np is None:
+            raise ImportError('open_tail(..., columnar=True) vereist numpy')
+        self._begin_lezen(i_sBestandGef, columnar)
+        self._volg_offset = None
+        self._volg_buffer = None
+        f = open(i_sBestandGef, 'rb')
         try:
-            return out
-        except:
-            return None
+            if not self._lees_header(f):
+                return False
+            self._volg_offset = f.tell()
+        finally:
+            f.close()
+        if columnar:
+            self.datablok_array = np.empty((0, self._aantal_kolommen()), dtype=np.float64)
+        return True
 
-    # Purpose: Of gegeven #MEASUREMENTVAR index aanwezig
-    def get_measurementvar_flag(self, i_Index):
-        if 'MEASUREMENTVAR' in self.headerdict:
-            if i_Index in self.headerdict['MEASUREMENTVAR']:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
+    def poll_tail(self):
+        """
+        Leest de volledige dataregels die sinds de vorige aanroep aan het bestand zijn toegevoegd en voegt
+        ze toe aan het data blok; een nog niet afgesloten laatste regel wordt bij de volgende aanroep gelezen.
+        De kosten zijn evenredig met het aantal nieuwe regels. Is het bestand korter geworden (opnieuw
+        begonnen), dan wordt het opnieuw vanaf de header gelezen.
+        :return: de nieuwe rijen: een 2-D numpy array (columnar) of een lijst met lijsten; leeg als er niets
+                 nieuw is of de header nog niet compleet is
+        """
+        if self._volg_offset is None:
+            if self._bestand is None or not self.open_tail(self._bestand, self._columnar):
+                return np.empty((0, 0)) if self._columnar else []
+        f = open(self._bestand, 'rb')
         try:
-            return out
-        except:
-            return None
+            grootte = os.fstat(f.fileno()).st_size
+            if grootte < self._volg_offset:
+                f.close()
+                if not self.open_tail(self._bestand, self._columnar):
+                    return np.empty((0, 0)) if self._columnar else []
+                f = open(self._bestand, 'rb')
+                grootte = os.fstat(f.fileno()).st_size
+            f.seek(self._volg_offset)
+            nieuw = f.read(grootte - self._volg_offset)
+        finally:
+            f.close()
+        einde = nieuw.rfind('\n') + 1
+        self._volg_offset += einde
+        regels = nieuw[:einde].splitlines(True)
+        if self._columnar:
+            rijen = self._parse_datablok_array(regels, self.datablok_array.shape[1])
+            self._voeg_rijen_toe(rijen)
+            return rijen
+        datablok = self.datablok
+        begin = len(datablok)
+        self._lees_datablok(regels)
+        return [datablok[i_Rij] for i_Rij in xrange(begin + 1, len(datablok) + 1)]
 
-    # Purpose: Geeft measurementtext tekst
-    def get_measurementtext_Tekst(self, i_Index):
-        if 'MEASUREMENTTEXT' in self.headerdict:
-            if i_Index in self.headerdict['MEASUREMENTTEXT']:
-                if 1 in self.headerdict['MEASUREMENTTEXT'][i_Index]:
-                    out = self.headerdict['MEASUREMENTTEXT'][i_Index][1]  # ??
-                else:
-                    err = 'MissingValue'
-            else:
-                err = 'MissingIndex'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+    def _voeg_rijen_toe(self, rijen):
+        """Voegt rijen toe aan self.datablok_array; de onderliggende buffer groeit met een factor 2."""
+        n = self.datablok_array.shape[0]
+        if self.datablok_array.shape[1] != rijen.shape[1]:  # geen kolommen in de header
+            self.datablok_array = np.empty((0, rijen.shape[1]), dtype=np.float64)
+            self._volg_buffer = None
+            n = 0
+        if self._volg_buffer is None or n + len(rijen) > len(self._volg_buffer):
+            buffer = np.empty((max(2 * (n + len(rijen)), 1024), rijen.shape[1]), dtype=np.float64)
+            buffer[:n] = self.datablok_array
+            self._volg_buffer = buffer
+        self._volg_buffer[n:n + len(rijen)] = rijen
+        self.datablok_array = self._volg_buffer[:n + len(rijen)]
 
-    # Purpose: Geeft measurementvar value
-    def get_measurementvar_Value(self, i_Index):
-        if 'MEASUREMENTVAR' in self.headerdict:
-            if i_Index in self.headerdict['MEASUREMENTVAR']:
-                if len(self.headerdict['MEASUREMENTVAR'][i_Index]) > 0:
-                    out = self.headerdict['MEASUREMENTVAR'][i_Index][1]
-                else:
-                    err = 'MissingValue'
+    def follow(self, i_sBestandGef, interval=1.0, columnar=False, callback=None, idle_timeout=None):
+        """
+        Volgt een gef bestand dat nog geschreven wordt: wacht tot de header compleet is en geeft daarna steeds
+        de nieuw toegevoegde rijen (zie poll_tail). Het volledige data blok blijft beschikbaar via get_data,
+        get_column_array, enz.
+        :param i_sBestandGef: pad naar het gef bestand
+        :param interval: wachttijd in seconden tussen twee controles
+        :param columnar: zie open_tail
+        :param callback: functie die met de nieuwe rijen wordt aangeroepen, bv. om een grafiek bij te werken
+        :param idle_timeout: stop als er zo veel seconden niets nieuws is geschreven, None om niet te stoppen
+        :return: generator van nieuwe rijen
+        """
+        gestart = self.open_tail(i_sBestandGef, columnar)
+        laatste = time.time()
+        while True:
+            if not gestart:
+                gestart = self.open_tail(i_sBestandGef, columnar)
+            if gestart:
+                rijen = self.poll_tail()
+                if len(rijen):
+                    laatste = time.time()
+                    if callback is not None:
+                        callback(rijen)
+                    yield rijen
+                    continue
+            if idle_timeout is not None and time.time() - laatste > idle_timeout:
+                return
+            time.sleep(interval)
+
+    # Purpose: Leest een Gef bestand regel voor regel zonder het data blok in geheugen te houden
+    def iter_rows(self, i_sBestandGef, columns=None):
+        """
+        Leest de header van een gef bestand in self.header en geeft daarna de dataregels een voor een
+        terug, rechtstreeks uit het bestand. Het geheugengebruik is constant, ongeacht de lengte van het
+        bestand. Nodata waarden (COLUMNVOID) worden None.
+        Na afloop kan het volledige data blok nog lui worden ingelezen via get_data en get_data_iter.
+        :param i_sBestandGef: pad naar het gef bestand
+        :param columns: lijst met kolom nummers (vanaf 1) die per rij worden teruggegeven, None voor alle kolommen
+        :return: generator van tuples met de waarden van de gevraagde kolommen
+        """
+        self._begin_lezen(i_sBestandGef, False)
+        f = open(i_sBestandGef, 'rb')
+        try:
+            if not self._lees_header(f):
+                return
+            self._data_offset = f.tell()
+            if columns is None:
+                columns = range(1, self._aantal_kolommen() + 1)
+            n_kol = max(columns) if columns else 0
+            voids = [self._void(i_Kol) for i_Kol in columns]
+            kolommen = zip([i_Kol - 1 for i_Kol in columns], voids)
+            aanvulling = [None] * n_kol
+            splits = self._rijsplitser()
+            for line in f:
+                data = splits(line)
+                if data:
+                    try:
+                        data = map(float, data)
+                    except ValueError:
+                        data = [_naar_getal(i.strip(" \t'")) for i in data]
+                    if len(data) < n_kol:
+                        data.extend(aanvulling)
+                    yield tuple([None if data[i] == void else data[i] for i, void in kolommen])
+        finally:
+            f.close()
+
+    # Purpose: Geeft de dataregels van het ingelezen bestand als getallen en teksten, bv. voor boringen
+    def iter_records(self):
+        """
+        Leest de dataregels van het laatst ingelezen bestand opnieuw vanaf data_offset en geeft ze een voor een
+        terug, met de teksten apart (zie _cellen_en_teksten), zodat codes als 'veen; sterk humeus' heel blijven.
+        Werkt ook na read_gef(..., header_only=True); het data blok wordt niet in het object bewaard.
+        :return: generator van (waarden, teksten): een lijst met de floats van de #COLUMN kolommen (nodata en
+                 niet-numerieke cellen NaN, ontbrekende cellen aangevuld met NaN) en een lijst met teksten
+        """
+        if self.data_offset is None:
+            return
+        n_kol = self._aantal_kolommen()
+        voids = [self._void(i_Kol) for i_Kol in range(1, n_kol + 1)]
+        nan_rij = [float('nan')] * n_kol
+        splits = self._rijsplitser()
+        rs = (self._header_tekst('RECORDSEPARATOR') or '').strip()
+        f = open(self._bestand, 'rb')
+        try:
+            f.seek(self.data_offset)
+            for line in f:
+                cellen, teksten = _cellen_en_teksten(line, splits, n_kol, rs)
+                if cellen or teksten:
+                    rij = ([_naar_float(cel) for cel in cellen] + nan_rij)[:n_kol]
+                    yield [float('nan') if waarde == void else waarde for waarde, void in zip(rij, voids)], teksten
+        finally:
+            f.close()
+
+    # Purpose: Geeft alle waarden van een kolom als numpy array
+    def get_column_array(self, i_Kol):
+        """
+        Geeft een kolom van het data blok als 1-D numpy array (float64).
+        Na read_gef(..., columnar=True) is dit een view op het data blok zonder kopie,
+        nodata waarden (COLUMNVOID) zijn dan NaN. Anders wordt de kolom uit het datablok gekopieerd.
+        :param i_Kol: kolom nummer (vanaf 1)
+        :return: numpy array met de waarden van de kolom
+        """
+        if self._data_offset is not None:
+            self._laad_datablok()
+        if self.datablok_array is not None:
+            if 0 < i_Kol <= self.datablok_array.shape[1]:
+                out = self.datablok_array[:, i_Kol - 1]
             else:
-                err = 'MissingIndex'
+                err = 'MissingKol'
+        elif self.datablok is not None:
+            datablok = self.datablok
+            if len(datablok) > 0 and len(datablok[1]) >= i_Kol > 0:
+                out = np.array([datablok[i_Rij][i_Kol - 1] for i_Rij in range(1, len(datablok) + 1)],
+                               dtype=np.float64)
+            else:
+                err = 'MissingKol'
         else:
-            err = 'MissingKeyword'
+            err = 'MissingDatablok'
         try:
             return out
         except:
             # return None
-            return 'Error:%s' % (err)
+            return self._fout(err, i_Kol)
+
+    # Purpose: Geeft een kolom als float array met NaN voor nodata, of None als de kolom ontbreekt
+    def get_column_values(self, i_Kol):
+        """
+        Geeft een kolom van het data blok als nieuwe 1-D numpy array (float64), met nodata waarden (COLUMNVOID)
+        en niet-numerieke cellen als NaN, zowel na read_gef(..., columnar=True) als zonder.
+        :param i_Kol: kolom nummer (vanaf 1)
+        :return: numpy array, of None als de kolom of het data blok ontbreekt (geen foutwaarde)
+        """
+        if np is None:
+            raise ImportError('get_column_values vereist numpy')
+        if self._data_offset is not None:
+            self._laad_datablok()
+        if self.datablok_array is not None:
+            if not 0 < i_Kol <= self.datablok_array.shape[1]:
+                return None
+            kolom = self.datablok_array[:, i_Kol - 1].copy()
+        elif self.datablok:
+            try:
+                n_kol = self._aantal_kolommen() or len(self.datablok[1])
+            except (ValueError, TypeError):
+                n_kol = len(self.datablok[1])
+            if not 0 < i_Kol <= n_kol:  # bv. de codes van een boring achter de #COLUMN kolommen
+                return None
+            nan = float('nan')
+            rijen = [self.datablok[i_Rij] for i_Rij in xrange(1, len(self.datablok) + 1)]
+            kolom = np.array([rij[i_Kol - 1] if len(rij) >= i_Kol and isinstance(rij[i_Kol - 1], float) else nan
+                              for rij in rijen], dtype=np.float64)
+        else:
+            return None
+        void = self._void(i_Kol)
+        if void is not None:
+            kolom[kolom == void] = np.nan
+        return kolom
+
+    # Purpose: Of gegeven #MEASUREMENTTEXT index aanwezig
+    def get_measurementtext_flag(self, i_Index):
+        return self.header.measurementtext is not None and i_Index in self.header.measurementtext
+
+    # Purpose: Of gegeven #MEASUREMENTVAR index aanwezig
+    def get_measurementvar_flag(self, i_Index):
+        return self.header.measurementvar is not None and i_Index in self.header.measurementvar
+
+    # Purpose: Geeft measurementtext tekst
+    def get_measurementtext_Tekst(self, i_Index):
+        teksten = self.header.measurementtext
+        if teksten is None:
+            return self._fout('MissingKeyword', 'measurementtext')
+        if i_Index not in teksten:
+            return self._fout('MissingIndex', i_Index)
+        if 1 in teksten[i_Index]:
+            return teksten[i_Index][1]  # ??
+        return self._fout('MissingValue', 'measurementtext')
+
+    # Purpose: Geeft measurementvar value
+    def get_measurementvar_Value(self, i_Index):
+        variabelen = self.header.measurementvar
+        if variabelen is None:
+            return self._fout('MissingKeyword', 'measurementvar')
+        if i_Index not in variabelen:
+            return self._fout('MissingIndex', i_Index)
+        if len(variabelen[i_Index]) > 0:
+            return variabelen[i_Index][1]
+        return self._fout('MissingValue', 'measurementvar')
 
     # Purpose: Geeft aantal rijen in het data block
     # neem aan waarde achter 'LASTSCAN', maar check dit!
+    # Na read_gef(..., columnar=True) het werkelijke aantal rijen in het data blok
     def get_nr_scans(self):
-        if 'LASTSCAN' in self.headerdict:
-            if len(self.headerdict['LASTSCAN']) > 0:
-                out = self.headerdict['LASTSCAN'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        if self.datablok_array is not None:
+            return self.datablok_array.shape[0]
+        return self._waarde('lastscan', 0)
 
     # Purpose: Of #PARENT aanwezig
     # neeem aan dat er een par 'PARENT' aanwezig moet zijn. Check!
     def get_parent_flag(self):
-        if ('PARENT' in self.headerdict):
-            if len(self.headerdict['PARENT']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None  # test
+        return self._flag('parent')
 
     # Purpose: Geeft referentie naar de parent, bv bestandsnaam
     def get_parent_reference(self):
-        if 'PARENT' in self.headerdict:
-            if len(self.headerdict['PARENT']) > 0:
-                out = self.headerdict['PARENT'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            return 'Error:%s' % (err)
+        return self._waarde('parent', 0)
 
     # Purpose: Of #PROCEDURECODE aanwezig
     def get_procedurecode_flag(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if len(self.headerdict['PROCEDURECODE']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('procedurecode')
 
     # Purpose: Geeft procedurecode code
     def get_procedurecode_Code(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if len(self.headerdict['PROCEDURECODE']) > 0:
-                out = self.headerdict['PROCEDURECODE'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('procedurecode', 0)
 
     # Purpose: Of #PROJECTID aanwezig
     def get_projectid_flag(self):
-        if 'PROJECTID' in self.headerdict:
-            if len(self.headerdict['PROJECTID']) > 0:
-                out = True
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        if self.header.projectid is None:
+            return None  # zoals voorheen: None (niet False) als #PROJECTID ontbreekt
+        return self._flag('projectid')
 
     # Purpose: Geeft projectid nummer
     def get_projectid_Number(self):
-        if 'PROJECTID' in self.headerdict:
-            if len(self.headerdict['PROJECTID']) > 1:
-                out = self.headerdict['PROJECTID'][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('projectid', 1, 1)
 
     # Purpose: Of #REPORTCODE aanwezig
     def get_reportcode_flag(self):
-        if 'REPORTCODE' in self.headerdict:
-            if len(self.headerdict['REPORTCODE']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('reportcode')
 
     # Purpose: Geeft reportcode code
     def get_reportcode_Code(self):
-        if 'REPORTCODE' in self.headerdict:
-            if len(self.headerdict['REPORTCODE']) > 0:
-                out = self.headerdict['REPORTCODE'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('reportcode', 0)
 
     # Purpose: Of #STARTDATE aanwezig
     def get_startdate_flag(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('startdate', 2)
 
     # Purpose: Geeft startdate jaar (yyyy)
     def get_startdate_Yyyy(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = int(self.headerdict['STARTDATE'][0])
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('startdate', 0, 2, int)
 
     # Purpose: Geeft startdate maand (mm)
     def get_startdate_Mm(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = int(self.headerdict['STARTDATE'][1])
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('startdate', 1, 2, int)
 
     # Purpose: Geeft startdate dag (dd)
     def get_startdate_Dd(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = int(self.headerdict['STARTDATE'][2])
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('startdate', 2, 2, int)
 
     # Purpose: Of #XYID aanwezig
     def get_xyid_flag(self):
-        if 'XYID' in self.headerdict:
-            if len(self.headerdict['XYID']) > 2:
-                out = True
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        if self.header.xyid is None:
+            return None  # zoals voorheen: None (niet False) als #XYID ontbreekt
+        return self._flag('xyid', 2)
 
     # Purpose: Geeft X coordinaat
     def get_xyid_X(self):
-        if 'XYID' in self.headerdict:
-            if len(self.headerdict['XYID']) > 0:
-                out = self.headerdict['XYID'][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('xyid', 1, 0)
 
     # Purpose: Geeft Y coordinaat
     def get_xyid_Y(self):
-        if 'XYID' in self.headerdict:
-            if len(self.headerdict['XYID']) > 1:
-                out = self.headerdict['XYID'][2]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('xyid', 2, 1)
 
     # Purpose: Of #ZID aanwezig
     def get_zid_flag(self):
-        if 'ZID' in self.headerdict:
-            if len(self.headerdict['ZID']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self._flag('zid')
 
     # Purpose: Geeft Z coordinaat
     def get_zid_Z(self):
-        if 'ZID' in self.headerdict:
-            if len(self.headerdict['ZID']) > 1:
-                out = self.headerdict['ZID'][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self._waarde('zid', 1, 1)
 
     # Purpose: Initialiseren interne geheugenstructuur
     # niet nodig
@@ -597,124 +1283,1059 @@ class Gef2OpenClass:
         """
         try:
             i_iQtyNumber = int(i_iQtyNumber)
-            for key, columninfo in self.headerdict['COLUMNINFO'].iteritems():
-                if int(columninfo[3]) == i_iQtyNumber:
-                    out = key
-                if get_corrected_depth and i_iQtyNumber == 1:
-                    if int(columninfo[3]) == 11:
-                        out = key
-            return int(out)
+            if get_corrected_depth and i_iQtyNumber == 1 and 11 in self.quantity_columns:
+                return self.quantity_columns[11]
+            return self.quantity_columns[i_iQtyNumber]
         except:
             # return None
-            print 'Error: Quantity Number niet gevonden in GEF file'
+            self._fout('MissingQuantity', i_iQtyNumber)
+            if self.verbose:
+                print 'Error: Quantity Number niet gevonden in GEF file'
+            return None
+
+    # Purpose: Geeft alle waarden van de kolom met een gegeven 'quantity number'
+    def get_column_by_quantity(self, i_iQtyNumber, get_corrected_depth=False, iterator=False):
+        """
+        Geeft de kolom met een gegeven quantity number, zonder qn2column en get_column_array apart aan te roepen.
+        :param i_iQtyNumber: quantity number volgens GEF definitie
+        :param get_corrected_depth: Wanneer TRUE en i_iQtyNumber = 1 wordt de kolom voor quantity number 11 gegeven
+        :param iterator: Wanneer TRUE (of zonder numpy) een iterator van (diepte, waarde) als get_data_iter
+        :return: numpy array als get_column_array, een iterator, of None als het quantity number ontbreekt
+        """
+        i_Kol = self.quantity_columns.get(int(i_iQtyNumber))
+        if get_corrected_depth and int(i_iQtyNumber) == 1:
+            i_Kol = self.quantity_columns.get(11, i_Kol)
+        if i_Kol is None:
+            return None
+        if iterator or np is None:
+            return self.get_data_iter(i_Kol)
+        return self.get_column_array(i_Kol)
+
+    # Purpose: Geeft afgeleide sondeerparameters (qt, Rf, Fr, Qtn, Ic, ...) voor het hele data blok
+    def get_derived(self, naam=None, unit_weight=18.0, groundwater_depth=1.0, area_ratio=None):
+        """
+        Berekent de afgeleide sondeerparameters met cpt_parameters uit de kolommen voor qc (quantity number 2),
+        fs (3) en u2 (6) en de (gecorrigeerde) diepte. Het resultaat wordt per combinatie van opties op het
+        object bewaard, zodat herhaald opvragen niets kost. Nodata waarden worden NaN.
+        :param naam: naam van de parameter (zie cpt_parameters, plus 'depth'), None voor een dict met alles
+        :param unit_weight: volumiek gewicht van de grond in kN/m3
+        :param groundwater_depth: diepte van de grondwaterstand in m
+        :param area_ratio: netto oppervlaktequotient van de conuspunt, standaard #MEASUREMENTVAR= 3, anders 1
+        :return: numpy array of dict met numpy arrays; Foutwaarde 'Error:GeenCPT' als het bestand geen
+                 GEF-CPT-Report is, 'Error:MissingKol' als qc of fs ontbreekt
+        """
+        if np is None:
+            raise ImportError('get_derived vereist numpy')
+        if not self.gcr_is_gcr():
+            return self._fout('GeenCPT', 'get_derived')
+        if area_ratio is None:
+            variabelen = self.header.measurementvar
+            if variabelen is not None and 3 in variabelen and len(variabelen[3]) > 1:
+                area_ratio = variabelen[3][1]
+            if not isinstance(area_ratio, float):
+                area_ratio = 1.0
+        sleutel = (unit_weight, groundwater_depth, area_ratio)
+        afgeleid = self._afgeleid.get(sleutel)
+        if afgeleid is None:
+            kolommen = [self.quantity_columns.get(11, self.quantity_columns.get(1))] + \
+                [self.quantity_columns.get(qn) for qn in (2, 3, 6)]
+            if None in kolommen[:3]:
+                return self._fout('MissingKol', 'get_derived')
+            diepte, qc, fs, u2 = [None if i_Kol is None else self.get_column_values(i_Kol) for i_Kol in kolommen]
+            if diepte is None or qc is None or fs is None:
+                return self._fout('MissingKol', 'get_derived')
+            afgeleid = cpt_parameters(diepte, qc, fs, u2, area_ratio, unit_weight, groundwater_depth)
+            afgeleid['depth'] = diepte
+            self._afgeleid[sleutel] = afgeleid
+        if naam is None:
+            return afgeleid
+        return afgeleid[naam]
+
+    # Purpose: Geeft de waarden van een kolom op een diepte raster
+    def get_resampled(self, kolom, depths):
+        """
+        Interpoleert een kolom lineair naar een diepte raster. De diepte is de kolom van
+        qn2column(1, get_corrected_depth=True); nodata waarden worden overgeslagen.
+        :param kolom: kolom nummer (vanaf 1) of naam van een afgeleide parameter (zie get_derived)
+        :param depths: diepten in m, bv. np.arange(0, 30, 0.1)
+        :return: numpy array met een waarde per diepte, NaN buiten het gemeten traject
+        """
+        diepte, waarden = self._diepte_en_kolom(kolom)
+        return interpoleer(diepte, waarden, depths)
+
+    # Purpose: Geeft een statistiek van een kolom per diepte interval (bv. per laag)
+    def get_aggregated(self, kolom, intervals, statistic='mean', percentile=50):
+        """
+        Aggregeert een kolom per diepte interval [boven, onder), zie aggregeer.
+        :param kolom: kolom nummer (vanaf 1) of naam van een afgeleide parameter (zie get_derived)
+        :param intervals: grenzen [d0, d1, ...] (bv. np.arange(0, 30.5, 0.5)) of lijst met (boven, onder) paren
+        :param statistic: 'mean', 'min', 'max', 'median', 'percentile' of 'count'
+        :param percentile: percentiel (0-100) voor statistic='percentile'
+        :return: numpy array met een waarde per interval, NaN voor intervallen zonder waarden
+        """
+        diepte, waarden = self._diepte_en_kolom(kolom)
+        return aggregeer(diepte, waarden, intervals, statistic, percentile)
+
+    def _diepte_en_kolom(self, kolom):
+        """Geeft (diepte, waarden) als float arrays met NaN voor nodata; kolom is een nummer of afgeleide naam."""
+        if np is None:
+            raise ImportError('get_resampled en get_aggregated vereisen numpy')
+        i_Diepte = self.quantity_columns.get(11, self.quantity_columns.get(1))
+        if i_Diepte is None:
+            raise ValueError('Geen diepte kolom (quantity number 1 of 11) gevonden')
+        if isinstance(kolom, basestring):
+            afgeleid = self.get_derived()
+            if isinstance(afgeleid, str):
+                raise ValueError('Afgeleide parameters niet beschikbaar: {}'.format(afgeleid))
+            return afgeleid['depth'], afgeleid[kolom]
+        diepte, waarden = self.get_column_values(i_Diepte), self.get_column_values(kolom)
+        if diepte is None or waarden is None:
+            raise ValueError('Kolom {} ontbreekt in het data blok'.format(kolom if waarden is None else i_Diepte))
+        return diepte, waarden
+
+    def _void(self, i_Kol):
+        """Geeft de nodata waarde (COLUMNVOID) van een kolom als float, of None; zonder foutafhandeling."""
+        voids = self.header.columnvoid
+        if voids is None or i_Kol not in voids:
             return None
+        void = voids[i_Kol]
+        return void[1] if len(void) > 1 and isinstance(void[1], float) else None
+
+    def _maak_header(self, header):
+        """
+        Zet self.header en bouwt self.quantity_columns op.
+        Bij dubbele quantity numbers in #COLUMNINFO telt de laatste kolom.
+        :param header: GefHeader, of dictionary zoals opgebouwd door _lees_header
+        """
+        self.header = header if isinstance(header, GefHeader) else GefHeader(header)
+        self.quantity_columns = {}
+        for key, columninfo in (self.header.columninfo.items() if self.header.columninfo is not None else ()):
+            try:
+                self.quantity_columns[int(columninfo[3])] = int(key)
+            except (IndexError, TypeError, ValueError):
+                pass
 
     # Purpose: Leest een gegeven Gef bestand en zet alle info in een dictionary
-    def read_gef(self, i_sBestandGef):
-        EOH = False
+    # Met columnar=True komt het data blok als 2-D numpy array in self.datablok_array
+    # Met header_only=True stopt het lezen bij #EOH; het data blok wordt pas bij de eerste
+    # aanroep van get_data, get_data_iter of get_column_array ingelezen
+    # Met een cache (zie GefCache) worden header en columnar data blok uit de cache gehaald
+    def read_gef(self, i_sBestandGef, columnar=False, header_only=False):
+        if columnar and np is None:
+            raise ImportError('read_gef(..., columnar=True) vereist numpy')
         try:
-            multipars = ['COLUMNINFO', 'COLUMNVOID', 'MEASUREMENTTEXT', 'MEASUREMENTVAR', 'SPECIMENVAR', 'SPECIMENTEXT']
-            self.headerdict = {}
-            f = open(i_sBestandGef, 'r')
-            tel = 0
-            for line in f.readlines():
-                line = re.sub('\r\n', '', line)  # haal alle \r\n aan het einde van de regel weg
-                linetmp = re.sub('(^[ \t]*)', '', line)  # remove trailing whitespace
-                # if not re.sub('^[\ \t]*$','',line)=='': # lege regels uitsluiten. moet dit in test_gef?
-                if not re.sub('^[\ \t]{0,}\n', '', linetmp) == '':  # lege regels uitsluiten. moet dit in test_gef?
-                    if 1 == 1:  # test1: begint line1 met '#' en komt '=' minstens 1x voor
-                        line = linetmp.split('=', 1)
-                        par = re.sub('^#([^ \t]*)[ \t]*$', '\\1', line[0])
-                        # start test
-                        # if par == 'EOH': deel='data'
-                        if EOH is False and not re.sub('^[^#].*', '',
-                                                       linetmp) == '':  # er komen regels niet begin met # voor.
-                            # einde test
-                            if len(line) > 1:
-                                keyinfo = line[1]
-                                keyinfo = re.sub('(^[ \t]*)', '', keyinfo)  # remove trailing whitespace
-                                keyinfo = re.sub('([,])([ \t])+', '\\1', re.sub('([ \t])+([,])', '\\2',
-                                                                                keyinfo))  # haal eerst alle witruimte (spaties/tabs) rond de separators (',') weg. 15-10-29
-                                if keyinfo <> '':
-                                    # print 'keyinfo: %s'%(keyinfo)
-                                    keyinfo = keyinfo.split(',')
-                                else:
-                                    keyinfo = None
-                            else:
-                                keyinfo = None
-                            b = keyinfo
-                            # print 'b: %s'%(b)
-                            if par in multipars:  # tabje hoger gezet zodat conditie alleen geldt als een par bestaat. 2015-10-29
-                                if is_number(b[0]):
-                                    parno = int(b[0]) # Gewijzigd in int voor eenvoudiger keys in dictionaries
-                                else:
-                                    parno = b[0]
-                                # del keyinfo[0]
-                                testpar = 'par1'
-                                c = []
-                                if keyinfo is not None:
-                                    for i in b:
-                                        e = removetrailers(i)
-                                        if is_number(e):
-                                            c.append(float(e))
-                                        else:
-                                            c.append(e)
-                                    if par not in self.headerdict:
-                                        self.headerdict[par] = {parno: c}
-                                    else:
-                                        self.headerdict[par][parno] = c
-                                else:
-                                    parno = None
-                        if par == 'EOH':
-                            self.headerdict['datablok'] = {}
-                            EOH = True
-                            self.headerdict[par] = {}
-                        if EOH is True and par <> 'EOH':
-                            tel = tel + 1
-                            data = par
-                            data = re.sub(';!', '', data)  # einde dataregel. moet hier een test op?
-                            data = re.sub("'", "", data)
-                            data = re.sub(' ', '', data)
-                            data = re.split(';|\|\t|\n', data)
-                            a2 = []
-                            for i in data:
-                                if is_number(i):
-                                    a2.append(float(i))
-                                else:
-                                    a2.append(i)
-                            self.headerdict['datablok'][tel] = a2
-                        if (par <> 'EOH') and (par not in multipars) and (EOH is not True):
-                            testpar = 'par2'
-                            c = []
-                            if b is not None:
-                                for i in b:
-                                    e = removetrailers(i)
-                                    if is_number(e):
-                                        c.append(float(e))
-                                    else:
-                                        c.append(e)
-                                self.headerdict[par] = c
-
+            self._begin_lezen(i_sBestandGef, columnar)
+            if self.cache is not None and (columnar or header_only):
+                if self._lees_uit_cache(header_only):
+                    return True
+            f = open(i_sBestandGef, 'rb')
+            try:
+                if self._lees_header(f):
+                    if header_only:
+                        self._data_offset = f.tell()
+                    elif columnar:
+                        data_offset = f.tell()
+                        self._lees_datablok_array(f)
+                        self._schrijf_in_cache(data_offset)
+                    else:
+                        self._lees_datablok(f)
+                if header_only:
+                    self._schrijf_in_cache(self._data_offset)
+            finally:
+                f.close()
             return True
 
         except IndexError:
-            print (
+            return self._leesfout(
                 "%s Headerdict() in UtlGefOpen.py geef IndexError: fout bij uitlezen gef" % os.path.basename(
-                    i_sBestandGef))
-            return False
+                    i_sBestandGef), met_traceback=False)
         except:
-            print "Fout bij het inlezen van gef {}".format(os.path.basename(i_sBestandGef))
-            Traceback()
+            return self._leesfout("Fout bij het inlezen van gef {}".format(os.path.basename(i_sBestandGef)))
+
+    # Purpose: Leest een (groot) Gef bestand via een memory map direct in een numpy array
+    def read_gef_mmap(self, i_sBestandGef):
+        """
+        Leest een gef bestand via mmap: de dataregels worden per venster van MMAP_BLOK bytes uit de
+        gemapte bytes direct in een vooraf gealloceerde 2-D float64 array geparsed. Het bestand wordt
+        nooit als geheel in geheugen gezet en elk venster wordt na gebruik weer vrijgegeven, zodat het
+        piekgeheugen dicht bij de grootte van de array blijft.
+        Het resultaat is gelijk aan read_gef(..., columnar=True).
+        :param i_sBestandGef: pad naar het gef bestand
+        :return: True als het inlezen gelukt is, anders False
+        """
+        if np is None:
+            raise ImportError('read_gef_mmap vereist numpy')
+        try:
+            self._begin_lezen(i_sBestandGef, True)
+            f = open(i_sBestandGef, 'rb')
+            try:
+                if self._lees_header(f):
+                    self._lees_datablok_mmap(f, f.tell())
+            finally:
+                f.close()
+            return True
+
+        except:
+            return self._leesfout("Fout bij het inlezen van gef {}".format(os.path.basename(i_sBestandGef)))
+
+    def _lees_datablok_mmap(self, f, begin):
+        """
+        Parsed het data blok via mmap vensters in een vooraf gealloceerde array.
+        Het aantal rijen wordt eerst bepaald door de regeleinden in de vensters te tellen. Elk stuk wordt
+        in een aanroep van np.fromstring omgezet; een stuk dat daarbij niet precies n_kol waarden per
+        regel oplevert (lege regels, tekst, vaste kolombreedtes) wordt regel voor regel verwerkt.
+        :param f: geopend gef bestand
+        :param begin: byte positie van de eerste dataregel
+        """
+        n_kol = self._aantal_kolommen()
+        einde = os.fstat(f.fileno()).st_size
+        n_regels = 0
+        laatste = '\n'
+        for venster, start in _mmap_vensters(f, begin, einde):
+            bytes_ = np.frombuffer(venster, dtype=np.uint8)[start:]
+            n_regels += int(np.count_nonzero(bytes_ == 10))
+            if len(bytes_):
+                laatste = venster[-1]
+            del bytes_
+        if laatste != '\n':
+            n_regels += 1
+
+        splits = self._rijsplitser()
+        controle = self._rijcontrole(splits)
+        tekens = [self.header.get(par)[0] for par in TEKENPARS
+                  if par in self.header and len(self.header.get(par)[0]) == 1]
+        snel = n_kol > 0 and kolombreedtes(self._header_tekst('DATAFORMAT')) is None
+        tabel = ''.join(' ' if chr(i) in tekens else chr(i) for i in range(256))
+
+        datablok = np.empty((n_regels, n_kol), dtype=np.float64)
+        rij = 0
+        for stuk in _mmap_stukken(f, begin, einde):
+            n_stuk = stuk.count('\n') + (0 if stuk.endswith('\n') else 1)
+            waarden = None
+            if snel:
+                vertaald = stuk.translate(tabel)
+                waarden = np.fromstring(vertaald, dtype=np.float64, sep=' ')
+                if waarden.size != n_stuk * n_kol or (_woorden_per_regel(vertaald) != n_kol).any():
+                    waarden = None
+            if waarden is not None:
+                datablok[rij:rij + n_stuk] = waarden.reshape(n_stuk, n_kol)
+                rij += n_stuk
+            else:
+                for line in stuk.splitlines():
+                    tekst = splits(line)
+                    if tekst:
+                        try:
+                            data = map(float, tekst)
+                        except ValueError:
+                            data = [_naar_float(i) for i in tekst]
+                            controle(line, tekst, n_kol or len(tekst))
+                        else:
+                            if len(data) != n_kol and n_kol:
+                                controle(line, tekst, n_kol)
+                        if n_kol == 0:
+                            n_kol = len(data)
+                            datablok = np.empty((n_regels, n_kol), dtype=np.float64)
+                        data = (data + [float('nan')] * n_kol)[:n_kol]
+                        datablok[rij] = data
+                        rij += 1
+        datablok = datablok[:rij]
+        self._vervang_voids(datablok)
+        self.datablok_array = datablok
+
+    def _header_tekst(self, par):
+        """Geeft de waarde van een keyword als tekst (waarden weer samengevoegd met ','), of None."""
+        waarden = self.header.get(par)
+        if waarden:
+            return ','.join(str(i) for i in waarden)
+        return None
+
+    def _begin_lezen(self, i_sBestandGef, columnar):
+        """Zet de interne geheugenstructuur klaar voor het inlezen van een nieuw bestand."""
+        self.__dict__.pop('headerdict', None)
+        self.datablok = None
+        self.datablok_array = None
+        self._bestand = i_sBestandGef
+        self._data_offset = None
+        self.data_offset = None
+        self._columnar = columnar
+        self._cache_sleutel = None
+        self.fout = None
+        self.header = GefHeader()
+        self.quantity_columns = {}
+        self._afgeleid = {}
+        self._leesfouten = {}
+        self._volg_offset = None
+
+    def _lees_uit_cache(self, header_only):
+        """
+        Haalt header en (bij columnar) het data blok van self._bestand uit de cache.
+        :return: True als alles wat nodig is in de cache stond
+        """
+        try:
+            self._cache_sleutel = self.cache.sleutel(self._bestand)
+            header = self.cache.lees_header(self._cache_sleutel)
+            if header is None:
+                return False
+            header, data_offset = header
+            self.data_offset = data_offset
+            if header_only or data_offset is None:
+                self._maak_header(header)
+                self.datablok = None if data_offset is None else {}
+                self._data_offset = data_offset
+                return True
+            datablok = self.cache.lees_data(self._cache_sleutel)
+            if datablok is None:
+                return False
+            self._maak_header(header)
+            self.datablok = {}
+            self.datablok_array = datablok
+            return True
+        except (IOError, OSError, EOFError, cPickle.UnpicklingError, ValueError):
             return False
 
+    def _schrijf_in_cache(self, data_offset):
+        """
+        Bewaart de zojuist ingelezen header (en het columnar data blok) in de cache; fouten worden genegeerd.
+        Een bestand met fouten uit het inlezen (zie test_gef) wordt niet bewaard, die fouten staan niet in de cache.
+        """
+        if self.cache is None or self._leesfouten:
+            return
+        try:
+            if self._cache_sleutel is None:
+                self._cache_sleutel = self.cache.sleutel(self._bestand)
+            self.cache.schrijf(self._cache_sleutel, self.header, data_offset, self.datablok_array)
+        except (IOError, OSError):
+            pass
+
+    def _laad_datablok(self):
+        """Leest het data blok na een read_gef(..., header_only=True) alsnog in vanaf de onthouden positie."""
+        offset = self._data_offset
+        self._data_offset = None
+        if self._columnar and self.cache is not None and self._cache_sleutel is not None:
+            try:
+                self.datablok_array = self.cache.lees_data(self._cache_sleutel)
+            except (IOError, OSError, ValueError):
+                self.datablok_array = None
+            if self.datablok_array is not None:
+                return
+        try:
+            f = open(self._bestand, 'rb')
+            try:
+                f.seek(offset)
+                if self._columnar:
+                    self._lees_datablok_array(f)
+                else:
+                    self._lees_datablok(f)
+                if self._columnar:
+                    self._schrijf_in_cache(offset)
+            finally:
+                f.close()
+        except:
+            self._leesfout("Fout bij het inlezen van data blok gef {}".format(os.path.basename(self._bestand)))
+
+    def _lees_header(self, f):
+        """
+        Leest de header regel voor regel tot en met #EOH en bouwt daaruit self.header op.
+        Elke regel wordt in een keer door _HEADERREGEL in keyword en waarden gesplitst.
+        :param f: bestand geopend in 'rb' modus, gepositioneerd aan het begin
+        :return: True wanneer #EOH gevonden is, het bestand staat dan op de eerste dataregel
+        """
+        headerdict = {}
+        readline = f.readline
+        line = readline()
+        if not line.lstrip(' \t').startswith('#GEFID'):
+            self._noteer_leesfout('HEADER', 'GefidNotFirst', '#GEFID is niet de eerste regel')
+        while line:
+            line = line.rstrip('\r\n').lstrip(' \t')
+            if line:
+                m = _HEADERREGEL.match(line)
+                if m is None:  # keyword met witruimte of regel zonder '#'
+                    par = line.split('=', 1)[0]
+                    keyinfo = None
+                else:
+                    par = m.group(1)
+                    keyinfo = m.group(2)
+                if par == 'EOH':
+                    self.datablok = {}
+                    self.data_offset = f.tell()
+                    self._maak_header(headerdict)
+                    return True
+                if keyinfo is not None:
+                    keyinfo = keyinfo.lstrip(' \t')
+                if keyinfo and par in TEKENPARS:
+                    headerdict[par] = [keyinfo.rstrip(' \t')]
+                elif keyinfo:
+                    b = _SCHEIDING.split(keyinfo)
+                    c = [_naar_getal(i.lstrip(' \t|')) for i in b]
+                    if par in MULTIPARS:
+                        if isinstance(c[0], float):
+                            parno = int(c[0])  # int voor eenvoudiger keys in dictionaries
+                        else:
+                            parno = b[0]
+                        if par not in headerdict:
+                            headerdict[par] = {parno: c}
+                        else:
+                            headerdict[par][parno] = c
+                    else:
+                        headerdict[par] = c
+            line = readline()
+        self._maak_header(headerdict)
+        return False
+
+    def _rijsplitser(self):
+        """Geeft de splitsfunctie voor dataregels volgens #COLUMNSEPARATOR, #RECORDSEPARATOR en #DATAFORMAT."""
+        return maak_rijsplitser(self._header_tekst('COLUMNSEPARATOR'), self._header_tekst('RECORDSEPARATOR'),
+                                self._header_tekst('DATAFORMAT'))
+
+    def _noteer_leesfout(self, aspect, code, tekst):
+        """Onthoudt een fout die bij het inlezen gevonden is voor test_gef: per code de eerste tekst en het aantal."""
+        fout = self._leesfouten.get(code)
+        if fout is None:
+            self._leesfouten[code] = [aspect, tekst, 1]
+        else:
+            fout[2] += 1
+
+    def _rijcontrole(self, splits):
+        """
+        Geeft een functie controle(line, data, n_kol) die voor een dataregel een afwijkend aantal waarden (bij
+        een boring zonder de codes, zie _cellen_en_teksten) en een diepte die geen getal is noteert. De parsers
+        roepen die alleen aan voor regels die niet precies n_kol getallen bevatten.
+        """
+        boring = bool(self._rapport_code('GEF-BORE-Report'))
+        i_Diepte = self.quantity_columns.get(1)
+
+        def controle(line, data, n_kol):
+            if n_kol and len(data) != n_kol:
+                n = len(_cellen_en_teksten(line, splits, n_kol)[0]) if boring else len(data)
+                if n != n_kol:
+                    self._noteer_leesfout('DATA', 'RowLength', '{} waarden in plaats van {}'.format(n, n_kol))
+            if i_Diepte is not None and 0 < i_Diepte <= len(data):
+                diepte = _naar_float(data[i_Diepte - 1])
+                if diepte != diepte:
+                    self._noteer_leesfout('DATA', 'DepthFormat', 'diepte is geen getal')
+        return controle
+
+    def _lees_datablok(self, f):
+        """
+        Leest alle dataregels na #EOH in self.datablok (key = rijnummer, vanaf 1).
+        Rijen die er al in staan blijven staan, de nieuwe rijen worden erachter gezet.
+        :param f: bestand gepositioneerd op de eerste regel na #EOH, of een lijst met regels
+        """
+        datablok = self.datablok
+        splits = self._rijsplitser()
+        controle = self._rijcontrole(splits)
+        try:
+            n_kol = self._aantal_kolommen()
+        except (ValueError, TypeError):
+            n_kol = 0
+        tel = len(datablok)
+        for line in f:
+            data = splits(line)
+            if data:
+                tel += 1
+                if n_kol == 0:
+                    n_kol = len(data)
+                try:
+                    datablok[tel] = map(float, data)
+                except ValueError:
+                    datablok[tel] = [_naar_getal(i.strip(" \t'")) for i in data]
+                    controle(line, data, n_kol)
+                else:
+                    if len(data) != n_kol:
+                        controle(line, data, n_kol)
+
+    def _lees_datablok_array(self, f):
+        """
+        Leest alle dataregels na #EOH direct in een 2-D float64 array (rijen x kolommen) in
+        self.datablok_array. Waarden gelijk aan COLUMNVOID en niet-numerieke cellen worden NaN.
+        :param f: bestand gepositioneerd op de eerste regel na #EOH
+        """
+        self.datablok_array = self._parse_datablok_array(f, self._aantal_kolommen())
+
+    def _parse_datablok_array(self, f, n_kol):
+        """
+        Zet dataregels om naar een 2-D float64 array met n_kol kolommen (0: aantal waarden van de eerste regel),
+        met NaN voor COLUMNVOID waarden en niet-numerieke cellen.
+        :param f: bestand of lijst met regels
+        """
+        waarden = array('d')
+        nan_rij = [float('nan')] * n_kol
+        splits = self._rijsplitser()
+        controle = self._rijcontrole(splits)
+        for line in f:
+            tekst = splits(line)
+            if tekst:
+                try:
+                    data = map(float, tekst)
+                except ValueError:
+                    data = [_naar_float(i) for i in tekst]
+                    controle(line, tekst, n_kol or len(tekst))
+                else:
+                    if len(data) != n_kol and n_kol:
+                        controle(line, tekst, n_kol)
+                if len(data) != n_kol:
+                    if n_kol == 0:
+                        n_kol = len(data)
+                        nan_rij = [float('nan')] * n_kol
+                    data = (data + nan_rij)[:n_kol]
+                waarden.extend(data)
+        if n_kol == 0:  # geen kolommen in header en geen data
+            datablok = np.empty((0, 0), dtype=np.float64)
+        else:
+            datablok = np.frombuffer(waarden, dtype=np.float64).reshape(-1, n_kol)
+        self._vervang_voids(datablok)
+        return datablok
+
+    def _aantal_kolommen(self):
+        if self.header.column is not None:
+            return int(self.header.column[0])
+        return len(self.header.columninfo or ())
+
+    def _vervang_voids(self, datablok):
+        """Vervangt in een 2-D data blok alle COLUMNVOID waarden door NaN."""
+        n_kol = datablok.shape[1]
+        for i_Kol, columnvoid in (self.header.columnvoid.items() if self.header.columnvoid is not None else ()):
+            void = columnvoid[1] if len(columnvoid) > 1 else None
+            if isinstance(i_Kol, int) and 0 < i_Kol <= n_kol and isinstance(void, float):
+                kolom = datablok[:, i_Kol - 1]
+                kolom[kolom == void] = np.nan
+
     # Purpose: Of een bestand geplot kan worden
     def is_plotable(self):
-        return 'datmoetenwenogeensuitzoeken'
+        """
+        Of het laatst ingelezen bestand geplot kan worden: header en data blok zonder fouten (zie test_gef),
+        een diepte kolom (quantity number 1) en ten minste een andere kolom.
+        """
+        if self._bestand is None or self._fouten(('HEADER', 'DATA')):
+            return False
+        return 1 in self.quantity_columns and len(self.quantity_columns) > 1
 
     # Purpose: Of een bepaald aspect van een bestand correct is
     # Parms  : Toegestaan: 'HEADER', 'DATA', 'GEF-CPT-Report','GEF-BORE-Report'
     def test_gef(self, i_sAspect):
-        return 'datmoetenwenogeensuitzoeken'
+        """
+        Controleert een aspect van het laatst ingelezen bestand in geheugen, zonder het opnieuw te lezen; de
+        controles zijn die van validate. Fouten in regels die bij het inlezen niet bewaard blijven (#GEFID niet
+        als eerste regel, afwijkend aantal waarden, diepte geen getal) zijn bij het inlezen genoteerd.
+        :return: True als er geen fouten (wel eventueel waarschuwingen) zijn
+        """
+        if i_sAspect not in ASPECTEN:
+            return self._fout('UnknownAspect', i_sAspect)
+        if self._bestand is None:
+            return False
+        return not self._fouten((i_sAspect,))
+
+    def _fouten(self, aspects):
+        """Geeft de fouten van het ingelezen bestand voor de aspecten (zie test_gef), zonder regelnummers."""
+        fouten = []
+
+        def meld(niveau, aspect, code, tekst, regel=None):
+            if niveau == 'fout' and aspect in aspects:
+                fouten.append(GefMelding(niveau, aspect, code, tekst, None))
+
+        if 'DATA' in aspects and self._data_offset is not None:
+            self._laad_datablok()
+        if self.fout is not None:
+            return [GefMelding('fout', aspect, 'ReadError', self.fout, None) for aspect in aspects]
+        for code, (aspect, tekst, aantal) in sorted(self._leesfouten.items()):
+            meld('fout', aspect, code, tekst if aantal == 1 else '{} ({} keer)'.format(tekst, aantal))
+        if self.datablok is None:
+            meld('fout', 'HEADER', 'MissingEOH', '#EOH ontbreekt')
+        self._valideer_header(meld)
+        for aspect in ('GEF-CPT-Report', 'GEF-BORE-Report'):
+            if aspect in aspects:
+                self._valideer_rapport(aspect, meld)
+        if 'DATA' in aspects and self.datablok is not None:
+            self._valideer_geladen_data(meld)
+        return fouten
+
+    def _valideer_geladen_data(self, meld):
+        """Controleert het ingelezen data blok: aantal rijen tegen #LASTSCAN en oplopende diepte (zonder nodata)."""
+        i_Diepte = self.quantity_columns.get(1)
+        if self.datablok_array is not None:
+            rijen, n_kol = self.datablok_array.shape
+            if i_Diepte is not None and 0 < i_Diepte <= n_kol:
+                diepte = self.datablok_array[:, i_Diepte - 1]
+                diepte = diepte[~np.isnan(diepte)]
+                if (np.diff(diepte) < 0).any():
+                    meld('fout', 'DATA', 'DepthNotMonotone', 'diepte neemt af')
+        else:
+            rijen = len(self.datablok)
+            if i_Diepte is not None and i_Diepte > 0:
+                void = self._void(i_Diepte)
+                vorige = None
+                for i_Rij in xrange(1, rijen + 1):
+                    rij = self.datablok[i_Rij]
+                    diepte = rij[i_Diepte - 1] if len(rij) >= i_Diepte else None
+                    if isinstance(diepte, float) and diepte == diepte and diepte != void:
+                        if vorige is not None and diepte < vorige:
+                            meld('fout', 'DATA', 'DepthNotMonotone', 'diepte neemt af')
+                            break
+                        vorige = diepte
+        self._valideer_aantal_rijen(rijen, meld)
+
+    def _valideer_aantal_rijen(self, rijen, meld):
+        if rijen == 0:
+            meld('fout', 'DATA', 'NoData', 'geen dataregels na #EOH')
+        lastscan = self.header.lastscan[0] if self.header.lastscan else None
+        if isinstance(lastscan, float) and int(lastscan) != rijen:
+            meld('fout', 'DATA', 'LastscanMismatch', '#LASTSCAN= {} maar {} dataregels'.format(int(lastscan), rijen))
+
+    # Purpose: Controleert de structuur van een Gef bestand in een keer lezen, zonder het data blok te bewaren
+    def validate(self, i_sBestandGef, aspects=None):
+        """
+        Controleert een gef bestand op de opgegeven aspecten. Het bestand wordt in een apart object gelezen:
+        de header volledig, het data blok in stukken en zonder het te bewaren. Een eerder in dit object
+        ingelezen bestand blijft staan.
+        HEADER: #GEFID als eerste regel, #EOH, verplichte keywords, #COLUMN tegen #COLUMNINFO en #COLUMNVOID.
+        DATA: aantal waarden per rij, #LASTSCAN tegen het aantal rijen, oplopende diepte (quantity number 1).
+        GEF-CPT-Report / GEF-BORE-Report: rapport code, verplichte keywords en kolommen voor dat type.
+        :param i_sBestandGef: pad naar het gef bestand
+        :param aspects: lijst met aspecten uit ASPECTEN, standaard HEADER, DATA en het rapport type
+                        volgens #PROCEDURECODE of #REPORTCODE
+        :return: lijst met GefMelding tuples, leeg als het bestand in orde is
+        """
+        return Gef2OpenClass(cache=False, verbose=False)._valideer_bestand(i_sBestandGef, aspects)
+
+    def _valideer_bestand(self, i_sBestandGef, aspects):
+        """Voert validate uit in dit object; een eerder ingelezen bestand wordt vervangen."""
+        meldingen = []
+        gekozen = ['HEADER', 'DATA'] if aspects is None else list(aspects)
+
+        def meld(niveau, aspect, code, tekst, regel=None):
+            if aspect in gekozen:
+                meldingen.append(GefMelding(niveau, aspect, code, tekst, regel))
+
+        self._begin_lezen(i_sBestandGef, False)
+        try:
+            f = open(i_sBestandGef, 'rb')
+        except IOError as e:
+            meld('fout', 'HEADER', 'OpenFailed', str(e))
+            return meldingen
+        try:
+            eoh = self._lees_header(f)
+            if 'GefidNotFirst' in self._leesfouten:
+                meld('fout', 'HEADER', 'GefidNotFirst', '#GEFID is niet de eerste regel', 1)
+            if not eoh:
+                meld('fout', 'HEADER', 'MissingEOH', '#EOH ontbreekt')
+            self._valideer_header(meld)
+            if aspects is None:
+                gekozen.extend(aspect for aspect in ('GEF-CPT-Report', 'GEF-BORE-Report') if self._rapport_code(aspect))
+            for aspect in ('GEF-CPT-Report', 'GEF-BORE-Report'):
+                if aspect in gekozen:
+                    self._valideer_rapport(aspect, meld)
+            if eoh and 'DATA' in gekozen:
+                positie = f.tell()
+                f.seek(0)
+                eerste_regel = f.read(positie).count('\n') + 1
+                self._valideer_data(f, eerste_regel, meld)
+        finally:
+            f.close()
+        return meldingen
+
+    def _valideer_header(self, meld):
+        for par in VERPLICHTE_KEYWORDS['HEADER']:
+            if par not in self.header:
+                meld('fout', 'HEADER', 'MissingKeyword', '#{} ontbreekt'.format(par))
+        if self.header.column is None:
+            return
+        try:
+            n_kol = int(self.header.column[0])
+        except (ValueError, TypeError):
+            meld('fout', 'HEADER', 'ColumnFormat', '#COLUMN is geen getal')
+            return
+        columninfo = self.header.get('COLUMNINFO', {})
+        if columninfo and len(columninfo) != n_kol:
+            meld('fout', 'HEADER', 'ColumnMismatch',
+                 '#COLUMN= {} maar {} keer #COLUMNINFO'.format(n_kol, len(columninfo)))
+        for i_Kol, info in sorted(columninfo.items()):
+            if not isinstance(i_Kol, int) or not 0 < i_Kol <= n_kol:
+                meld('fout', 'HEADER', 'ColumnInfoNumber',
+                     '#COLUMNINFO voor kolom {} buiten 1..{}'.format(i_Kol, n_kol))
+            elif len(info) < 4 or not isinstance(info[3], float):
+                meld('fout', 'HEADER', 'ColumnInfoFormat',
+                     '#COLUMNINFO voor kolom {} heeft geen quantity number'.format(i_Kol))
+        for i_Kol, void in sorted(self.header.get('COLUMNVOID', {}).items()):
+            if not isinstance(i_Kol, int) or not 0 < i_Kol <= n_kol:
+                meld('waarschuwing', 'HEADER', 'ColumnVoidNumber',
+                     '#COLUMNVOID voor kolom {} buiten 1..{}'.format(i_Kol, n_kol))
+
+    def _rapport_code(self, aspect):
+        """Of #PROCEDURECODE of #REPORTCODE het rapport type aspect aangeeft."""
+        return [par for par in ('procedurecode', 'reportcode')
+                if getattr(self.header, par) and str(getattr(self.header, par)[0]).startswith(aspect)]
+
+    def _valideer_rapport(self, aspect, meld):
+        if not self._rapport_code(aspect):
+            meld('fout', aspect, 'WrongReportType', 'geen {} volgens #PROCEDURECODE of #REPORTCODE'.format(aspect))
+        for par in VERPLICHTE_KEYWORDS[aspect]:
+            if par not in self.header:
+                meld('fout', aspect, 'MissingKeyword', '#{} ontbreekt'.format(par))
+        for qn in VERPLICHTE_KOLOMMEN[aspect]:
+            if qn not in self.quantity_columns:
+                meld('fout', aspect, 'MissingQuantity', 'geen kolom met quantity number {}'.format(qn))
+
+    def _valideer_data(self, f, eerste_regel, meld):
+        """
+        Doorloopt het data blok in stukken. Een stuk wordt in een keer met np.fromstring omgezet als elke regel
+        precies n_kol getallen bevat; anders (tekst, lege regels, afwijkende rijen, vaste kolombreedte) regel
+        voor regel. Bij een boring tellen alleen de #COLUMN numerieke cellen voor de codes mee (zie
+        _cellen_en_teksten).
+        """
+        try:
+            n_kol = self._aantal_kolommen()
+        except (ValueError, TypeError):
+            n_kol = 0
+        i_Diepte = self.quantity_columns.get(1)
+        void = self._void(i_Diepte)
+        splits = self._rijsplitser()
+        tekens = [self.header.get(par)[0] for par in TEKENPARS
+                  if par in self.header and len(self.header.get(par)[0]) == 1]
+        tabel = ''.join(' ' if chr(i) in tekens else chr(i) for i in range(256))
+        boring = bool(self._rapport_code('GEF-BORE-Report'))
+        snel = (np is not None and n_kol > 0 and not boring and
+                kolombreedtes(self._header_tekst('DATAFORMAT')) is None)
+        tellers = {}
+
+        def meld_rij(code, tekst, regel):
+            tellers[code] = tellers.get(code, 0) + 1
+            if tellers[code] <= MAX_MELDINGEN:
+                meld('fout', 'DATA', code, tekst, regel)
+
+        rijen = 0
+        regel = eerste_regel
+        vorige = None  # laatste diepte
+        for stuk in _stukken(f):
+            n_stuk = stuk.count('\n') + (0 if stuk.endswith('\n') else 1)
+            waarden = None
+            if snel:
+                vertaald = stuk.translate(tabel)
+                waarden = np.fromstring(vertaald, dtype=np.float64, sep=' ')
+                if waarden.size != n_stuk * n_kol or (_woorden_per_regel(vertaald) != n_kol).any():
+                    waarden = None
+            if waarden is not None:
+                if i_Diepte is not None and 0 < i_Diepte <= n_kol:
+                    diepte = waarden.reshape(n_stuk, n_kol)[:, i_Diepte - 1]
+                    index = np.flatnonzero(diepte != void) if void is not None else np.arange(n_stuk)
+                    if len(index):
+                        reeks = diepte[index] if vorige is None else np.concatenate(([vorige], diepte[index]))
+                        dalend = np.flatnonzero(np.diff(reeks) < 0)
+                        for i in dalend:
+                            i_Rij = index[i + 1] if vorige is None else index[i]
+                            meld_rij('DepthNotMonotone', 'diepte neemt af', regel + i_Rij)
+                        vorige = diepte[index[-1]]
+                rijen += n_stuk
+                regel += n_stuk
+                continue
+            for line in stuk.splitlines():
+                data = _cellen_en_teksten(line, splits, n_kol)[0] if boring else splits(line)
+                if data:
+                    rijen += 1
+                    if n_kol == 0:
+                        n_kol = len(data)
+                    if len(data) != n_kol:
+                        meld_rij('RowLength', '{} waarden in plaats van {}'.format(len(data), n_kol), regel)
+                    if i_Diepte is not None and len(data) >= i_Diepte:
+                        diepte = _naar_float(data[i_Diepte - 1])
+                        if diepte != diepte:
+                            meld_rij('DepthFormat', 'diepte is geen getal', regel)
+                        elif diepte != void:
+                            if vorige is not None and diepte < vorige:
+                                meld_rij('DepthNotMonotone', 'diepte neemt af', regel)
+                            vorige = diepte
+                regel += 1
+        self._valideer_aantal_rijen(rijen, meld)
+        for code, aantal in sorted(tellers.items()):
+            if aantal > MAX_MELDINGEN:
+                meld('waarschuwing', 'DATA', code,
+                     '{} meldingen, alleen de eerste {} getoond'.format(aantal, MAX_MELDINGEN))
+
+
+class GefCache(object):
+    """
+    Cache op schijf met ingelezen gef bestanden. Per bestand worden de header (pickle) en het
+    columnar data blok (numpy .npy) opgeslagen onder de md5 hash van de inhoud, dezelfde sleutel als
+    CompareResults.getBestanden gebruikt. De hash wordt per pad (in geheugen en in de submap 'paden')
+    onthouden zolang grootte en mtime niet veranderen. Wordt max_bytes overschreden, dan worden de langst niet gebruikte items
+    verwijderd (LRU, op basis van de mtime van de cache bestanden).
+    """
+    versie = 2  # verhogen als de vorm van de header of datablok_array verandert
+
+    def __init__(self, map, max_bytes=1 << 30):
+        """
+        :param map: map waarin de cache wordt bewaard, wordt aangemaakt als die niet bestaat
+        :param max_bytes: maximale totale grootte van de cache in bytes
+        """
+        self.map = map
+        self.max_bytes = max_bytes
+        self._hashes = {}  # pad -> ((grootte, mtime), md5)
+        self._grootte = None
+        self._padenmap = os.path.join(map, 'paden')
+        if not os.path.isdir(self._padenmap):
+            os.makedirs(self._padenmap)
+
+    def sleutel(self, pad):
+        """Geeft de md5 hash van de inhoud van pad; alleen opnieuw berekend als grootte of mtime wijzigt."""
+        pad = os.path.abspath(pad)
+        st = os.stat(pad)
+        kenmerk = '{} {!r}'.format(st.st_size, st.st_mtime)
+        bekend = self._hashes.get(pad)
+        if bekend is not None and bekend[0] == kenmerk:
+            return bekend[1]
+        padbestand = os.path.join(self._padenmap, hashlib.md5(pad).hexdigest())
+        try:
+            f = open(padbestand, 'rb')
+            try:
+                opgeslagen, md5 = f.read().rsplit(' ', 1)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            opgeslagen = md5 = None
+        if opgeslagen != kenmerk:
+            md5 = file_md5(pad)
+            f = open(padbestand, 'wb')
+            try:
+                f.write('{} {}'.format(kenmerk, md5))
+            finally:
+                f.close()
+        self._hashes[pad] = (kenmerk, md5)
+        return md5
+
+    def _pad(self, sleutel, extensie):
+        return os.path.join(self.map, '{}.v{}.{}'.format(sleutel, self.versie, extensie))
+
+    def _open_lru(self, pad):
+        """Opent een cache bestand en markeert het als recent gebruikt, of None als het niet bestaat."""
+        try:
+            f = open(pad, 'rb')
+        except IOError:
+            return None
+        try:
+            os.utime(pad, None)
+        except OSError:
+            pass
+        return f
+
+    def lees_header(self, sleutel):
+        """:return: (GefHeader, data_offset) of None als de sleutel niet in de cache staat"""
+        f = self._open_lru(self._pad(sleutel, 'hdr'))
+        if f is None:
+            return None
+        try:
+            return cPickle.load(f)
+        finally:
+            f.close()
+
+    def lees_data(self, sleutel):
+        """:return: het data blok als numpy array, of None als het niet in de cache staat"""
+        f = self._open_lru(self._pad(sleutel, 'npy'))
+        if f is None:
+            return None
+        try:
+            return np.load(f)
+        finally:
+            f.close()
+
+    def schrijf(self, sleutel, header, data_offset, datablok_array=None):
+        """Bewaart header en eventueel data blok; schrijft via een tijdelijk bestand zodat lezers nooit een half item zien."""
+        items = [(self._pad(sleutel, 'hdr'), lambda f: cPickle.dump((header, data_offset), f, 2))]
+        if datablok_array is not None:
+            items.append((self._pad(sleutel, 'npy'), lambda f: np.save(f, datablok_array)))
+        for pad, schrijver in items:
+            tijdelijk = '{}.{}.tmp'.format(pad, os.getpid())
+            f = open(tijdelijk, 'wb')
+            try:
+                schrijver(f)
+            finally:
+                f.close()
+            oud = os.path.getsize(pad) if os.path.exists(pad) else 0
+            try:
+                os.rename(tijdelijk, pad)
+            except OSError:  # Windows: bestaat al (door een ander proces geschreven)
+                os.remove(tijdelijk)
+                continue
+            if self._grootte is not None:
+                self._grootte += os.path.getsize(pad) - oud
+        self._ruim_op()
+
+    def _ruim_op(self):
+        """Verwijdert de langst niet gebruikte cache bestanden zodra de cache groter is dan max_bytes."""
+        if self._grootte is None:
+            self._grootte = sum(os.path.getsize(pad) for pad in self._items())
+        if self._grootte <= self.max_bytes:
+            return
+        bestanden = []
+        for pad in self._items():
+            try:
+                st = os.stat(pad)
+            except OSError:
+                continue
+            bestanden.append((st.st_mtime, st.st_size, pad))
+        bestanden.sort()
+        self._grootte = sum(b[1] for b in bestanden)
+        doel = self.max_bytes * 0.9  # wat ruimte maken zodat niet elke volgende schrijfactie opruimt
+        for mtime, grootte, pad in bestanden:
+            if self._grootte <= doel:
+                break
+            try:
+                os.remove(pad)
+                self._grootte -= grootte
+            except OSError:
+                pass
+
+    def _items(self):
+        """Geeft de paden van alle cache bestanden (zonder de submap 'paden')."""
+        return [os.path.join(self.map, naam) for naam in os.listdir(self.map) if naam != 'paden']
+
+    def leeg(self):
+        """Verwijdert alle items uit de cache."""
+        for pad in self._items():
+            os.remove(pad)
+        for naam in os.listdir(self._padenmap):
+            os.remove(os.path.join(self._padenmap, naam))
+        self._grootte = 0
+        self._hashes = {}
+
+
+# Standaard cache voor alle Gef2OpenClass objecten; in te stellen via de omgevingsvariabele
+# GEF2OPEN_CACHE (map) of door hier een GefCache toe te kennen
+STANDAARD_CACHE = None
+if os.environ.get('GEF2OPEN_CACHE'):
+    STANDAARD_CACHE = GefCache(os.environ['GEF2OPEN_CACHE'])
+
+
+# Resultaat van read_gef_many per bestand; gef is None als het inlezen mislukt is
+GefResultaat = namedtuple('GefResultaat', ['pad', 'gef', 'fout'])
+
+
+def _read_gef_worker(args):
+    pad, columnar, header_only, derived = args
+    gef = Gef2OpenClass(verbose=False)  # fouten gaan per bestand terug in GefResultaat
+    if gef.read_gef(pad, columnar=columnar, header_only=header_only):
+        gef.cache = None  # niet mee terugsturen naar het hoofdproces
+        if derived is not None:
+            try:
+                afgeleid = gef.get_derived(**derived)
+            except Exception:
+                return GefResultaat(pad, None, _foutmelding())
+            if isinstance(afgeleid, str):
+                return GefResultaat(pad, None, afgeleid)
+        return GefResultaat(pad, gef, None)
+    return GefResultaat(pad, None, gef.fout)
+
+
+# Purpose: Leest een lijst Gef bestanden parallel in met een pool van processen
+def read_gef_many(paths, workers=None, columnar=None, header_only=False, chunksize=16, derived=None,
+                  diagnostics=None, verbose=False):
+    """
+    Leest een lijst gef bestanden in, verdeeld over een pool van processen. Elk proces leest met
+    read_gef en stuurt het Gef2OpenClass object terug (in columnar modus alleen header en een numpy array).
+    Fouten worden per bestand teruggegeven in plaats van de verwerking af te breken.
+    Op Windows moet de aanroep binnen een 'if __name__ == '__main__':' blok staan.
+    :param paths: lijst met paden naar gef bestanden
+    :param workers: aantal processen, standaard het aantal processoren; 1 leest in het huidige proces
+    :param columnar: doorgegeven aan read_gef, standaard True als numpy beschikbaar is
+    :param header_only: doorgegeven aan read_gef
+    :param chunksize: aantal bestanden dat per keer naar een proces gaat
+    :param derived: dict met opties voor get_derived (bv. {} voor de standaard opties); de afgeleide
+                    parameters worden dan in de processen berekend en op de teruggegeven objecten bewaard
+    :param diagnostics: GefDiagnostics waarin de mislukte bestanden worden geregistreerd
+    :param verbose: een regel met aantal bestanden, duur en aantal fouten printen
+    :return: lijst met GefResultaat(pad, gef, fout) in de volgorde van paths
+    """
+    if columnar is None:
+        columnar = np is not None
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    taken = [(pad, columnar, header_only, derived) for pad in paths]
+    t0 = time.time()
+    if workers <= 1:
+        resultaten = map(_read_gef_worker, taken)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            resultaten = list(pool.imap(_read_gef_worker, taken, chunksize))
+        finally:
+            pool.close()
+            pool.join()
+    duur = time.time() - t0
+    if diagnostics is not None:
+        for resultaat in resultaten:
+            if resultaat.fout is not None:
+                code = resultaat.fout.code if is_fout(resultaat.fout) else 'ReadError'
+                diagnostics.add(resultaat.pad, code, resultaat.fout)
+    if verbose:
+        n_fout = sum(1 for resultaat in resultaten if resultaat.fout is not None)
+        print 'read_gef_many: {} bestanden in {:.2f} s ({:.0f} bestanden/s, {} processen), {} fouten'.format(
+            len(resultaten), duur, len(resultaten) / duur if duur > 0 else 0, workers, n_fout)
+    return resultaten
+
+
+# Purpose: Zet een kolom van veel Gef bestanden tegelijk op een diepte raster of per interval
+def resample_many(gefs, kolom, depths=None, intervals=None, statistic='mean', percentile=50, workers=None):
+    """
+    Interpoleert (depths) of aggregeert (intervals) een kolom voor een lijst gef bestanden.
+    Paden worden eerst met read_gef_many (columnar) ingelezen.
+    :param gefs: lijst met Gef2OpenClass objecten, GefResultaat tuples of paden
+    :param kolom: kolom nummer, quantity number via {'quantity': qn}, of naam van een afgeleide parameter
+    :param depths: diepte raster voor get_resampled
+    :param intervals: intervallen voor get_aggregated (als depths None is)
+    :param statistic: statistiek voor get_aggregated
+    :param percentile: percentiel voor statistic='percentile'
+    :param workers: aantal processen voor read_gef_many
+    :return: 2-D numpy array met een rij per bestand (NaN voor bestanden die niet gelezen konden worden)
+    """
+    if (depths is None) == (intervals is None):
+        raise ValueError('Geef depths of intervals')
+    paden = [i for i in gefs if isinstance(i, basestring)]
+    ingelezen = dict((resultaat.pad, resultaat.gef) for resultaat in read_gef_many(paden, workers=workers)) \
+        if paden else {}
+    n = len(depths) if depths is not None else len(_intervallen(intervals)[0])
+    uit = np.full((len(gefs), n), np.nan)
+    for rij, gef in enumerate(gefs):
+        if isinstance(gef, basestring):
+            gef = ingelezen.get(gef)
+        elif isinstance(gef, GefResultaat):
+            gef = gef.gef
+        if gef is None:
+            continue
+        i_Kol = gef.quantity_columns.get(kolom['quantity']) if isinstance(kolom, dict) else kolom
+        if i_Kol is None:
+            continue
+        try:
+            if depths is not None:
+                uit[rij] = gef.get_resampled(i_Kol, depths)
+            else:
+                uit[rij] = gef.get_aggregated(i_Kol, intervals, statistic, percentile)
+        except (ValueError, KeyError):
+            pass
+    return uit
+
+
+# Purpose: Controleert een lijst Gef bestanden voordat ze verder verwerkt worden
+def validate_many(paths, aspects=None):
+    """
+    Controleert gef bestanden met een Gef2OpenClass object (zie Gef2OpenClass.validate).
+    :param paths: lijst met paden naar gef bestanden
+    :param aspects: lijst met aspecten uit ASPECTEN, zie Gef2OpenClass.validate
+    :return: lijst met (pad, meldingen) in de volgorde van paths
+    """
+    gef = Gef2OpenClass(cache=False, verbose=False)
+    return [(pad, gef._valideer_bestand(pad, aspects)) for pad in paths]
+
+
+# Purpose: Geeft de md5 hash van een bestand, in blokken gelezen
+def file_md5(pad, blok=1 << 20):
+    md5 = hashlib.md5()
+    f = open(pad, 'rb')
+    try:
+        data = f.read(blok)
+        while data:
+            md5.update(data)
+            data = f.read(blok)
+    finally:
+        f.close()
+    return md5.hexdigest()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,249 @@
+# Inlezen van boringen (GEF-BORE-Report) in een compacte laagtabel
+# De header wordt met Gef2OpenClass.read_gef(..., header_only=True) gelezen; het data blok komt uit
+# Gef2OpenClass.iter_records, omdat de lagen naast getallen ook grondsoort codes tussen enkele quotes bevatten, bv.
+#   0.00;1.20;'Zs1h1';'ZMFO';'DO TOT';!
+# Per boring komen boven- en onderkant, grondsoort en overige codes in numpy arrays (kolomsgewijs).
+
+import multiprocessing
+from collections import namedtuple
+
+import numpy as np
+
+import Gef2Open
+
+# Een laag: diepte boven en onder (m), grondsoort code en een tuple met de overige codes
+Laag = namedtuple('Laag', ['boven', 'onder', 'grondsoort', 'extra'])
+
+
+def _tekst_array(teksten):
+    """Zet een lijst teksten om naar een numpy array met vaste breedte (compact, snel te picklen)."""
+    return np.array(teksten, dtype='S{}'.format(max([len(tekst) for tekst in teksten] + [1])))
+
+
+class Lagentabel(object):
+    """
+    Laagtabel van een boring, gesorteerd op bovenkant.
+    boven, onder: float arrays met diepte (m) van boven- en onderkant
+    grondsoort: array met de eerste code van elke laag
+    extra, extra_start: overige codes achter elkaar, die van laag i in extra[extra_start[i]:extra_start[i + 1]]
+    waarden: 2-D float array met de overige numerieke kolommen (kolommen: hun kolomnummers), NaN voor nodata
+    x, y, z: #XYID en #ZID, None als ze ontbreken
+    """
+    __slots__ = ('boven', 'onder', 'grondsoort', 'extra', 'extra_start', 'waarden', 'kolommen', 'x', 'y', 'z')
+
+    def __init__(self, boven, onder, grondsoort, extra, extra_start, waarden=None, kolommen=(),
+                 x=None, y=None, z=None):
+        self.boven = np.asarray(boven, dtype=np.float64)
+        self.onder = np.asarray(onder, dtype=np.float64)
+        self.grondsoort = grondsoort
+        self.extra = extra
+        self.extra_start = np.asarray(extra_start, dtype=np.int32)
+        self.waarden = np.empty((len(self.boven), 0)) if waarden is None else waarden
+        self.kolommen = tuple(kolommen)
+        self.x, self.y, self.z = x, y, z
+
+    def __len__(self):
+        return len(self.boven)
+
+    def __getitem__(self, i):
+        return Laag(float(self.boven[i]), float(self.onder[i]), str(self.grondsoort[i]),
+                    tuple(str(code) for code in self.extra[self.extra_start[i]:self.extra_start[i + 1]]))
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __getstate__(self):
+        return tuple(getattr(self, naam) for naam in self.__slots__)
+
+    def __setstate__(self, toestand):
+        for naam, waarde in zip(self.__slots__, toestand):
+            setattr(self, naam, waarde)
+
+    def laag_index(self, diepte):
+        """
+        Geeft de index van de laag waarin een diepte ligt, -1 buiten de lagen (of in een gat ertussen).
+        :param diepte: diepte in m, getal of array
+        :return: int of int array
+        """
+        d = np.asarray(diepte, dtype=np.float64)
+        i = np.searchsorted(self.boven, d, side='right') - 1
+        with np.errstate(invalid='ignore'):
+            binnen = (i >= 0) & (d <= self.onder[np.maximum(i, 0)]) if len(self) else np.zeros(d.shape, dtype=bool)
+        i = np.where(binnen, i, -1)
+        return int(i) if i.ndim == 0 else i
+
+    def grondsoort_op(self, diepte):
+        """Geeft de grondsoort op een diepte (m), None buiten de lagen; voor een array een array ('' buiten)."""
+        i = self.laag_index(diepte)
+        if isinstance(i, int):
+            return str(self.grondsoort[i]) if i >= 0 else None
+        return np.where(i >= 0, self.grondsoort[np.maximum(i, 0)] if len(self) else '', '')
+
+    def dikte(self):
+        """Geeft de totale dikte (m) per grondsoort als dict."""
+        dikte = self.onder - self.boven
+        return dict((str(code), float(dikte[self.grondsoort == code].sum())) for code in np.unique(self.grondsoort))
+
+
+def parse_lagen(gef, rijen=None):
+    """
+    Verwerkt het data blok van een boring tot een Lagentabel. De eerste tekst van een regel is de grondsoort,
+    de overige teksten zijn de extra codes.
+    :param gef: Gef2OpenClass object met de ingelezen header
+    :param rijen: (waarden, teksten) per dataregel als uit Gef2OpenClass.iter_records, standaard gef.iter_records()
+    """
+    header = gef.header
+    n_kol = int(header.column[0]) if header.column else len(header.columninfo or ())
+    i_Boven = gef.quantity_columns.get(1, 1) - 1
+    i_Onder = gef.quantity_columns.get(2, 2) - 1
+    kolommen = [i_Kol for i_Kol in range(1, n_kol + 1) if i_Kol - 1 not in (i_Boven, i_Onder)]
+
+    getallen = []
+    grondsoorten = []
+    extra = []
+    extra_start = [0]
+    for waarden, teksten in (gef.iter_records() if rijen is None else rijen):
+        getallen.append(waarden)
+        grondsoorten.append(teksten[0].strip() if teksten else '')
+        extra.extend(tekst.strip() for tekst in teksten[1:] if tekst.strip())
+        extra_start.append(len(extra))
+
+    getallen = np.array(getallen, dtype=np.float64).reshape(-1, n_kol)
+    boven = getallen[:, i_Boven] if i_Boven < n_kol else np.full(len(getallen), np.nan)
+    onder = getallen[:, i_Onder] if i_Onder < n_kol else np.full(len(getallen), np.nan)
+    volgorde = np.argsort(boven, kind='mergesort')
+    grondsoort = _tekst_array(grondsoorten)[volgorde]
+    extra_start = np.array(extra_start, dtype=np.int32)
+    extra = _tekst_array(extra)
+    if len(volgorde) and (np.diff(volgorde) != 1).any():  # lagen niet op volgorde in het bestand
+        delen = [extra[extra_start[i]:extra_start[i + 1]] for i in volgorde]
+        extra = np.concatenate(delen) if delen else extra
+        extra_start = np.concatenate(([0], np.cumsum([len(deel) for deel in delen]))).astype(np.int32)
+    waarden = getallen[volgorde][:, [i_Kol - 1 for i_Kol in kolommen]]
+    return Lagentabel(boven[volgorde], onder[volgorde], grondsoort, extra, extra_start, waarden, kolommen,
+                      header.x, header.y, header.z)
+
+
+# Purpose: Leest een boring (GEF-BORE-Report) in als Lagentabel
+def read_bore(pad, gef=None):
+    """
+    Leest header en lagen van een boring.
+    :param pad: pad naar het gef bestand
+    :param gef: Gef2OpenClass object om te gebruiken, standaard een nieuw object zonder meldingen
+    :return: Lagentabel, of None als het inlezen mislukt of het geen boring is (de fout staat in gef.fout)
+    """
+    if gef is None:
+        gef = Gef2Open.Gef2OpenClass(verbose=False)
+    if not gef.read_gef(pad, header_only=True):
+        return None
+    if gef.data_offset is None:
+        gef.fout = '#EOH ontbreekt'
+        return None
+    if not gef.gbr_is_gbr():
+        gef.fout = 'Geen GEF-BORE-Report'
+        return None
+    return parse_lagen(gef)
+
+
+def _read_bore_worker(pad):
+    gef = Gef2Open.Gef2OpenClass(verbose=False)
+    try:
+        tabel = read_bore(pad, gef)
+    except (ValueError, IndexError):
+        return pad, None, Gef2Open._foutmelding()
+    return pad, tabel, gef.fout if tabel is None else None
+
+
+def read_bore_many(paths, workers=None):
+    """
+    Leest een lijst boringen in, verdeeld over een pool van processen.
+    :param paths: lijst met paden naar gef bestanden
+    :param workers: aantal processen, standaard het aantal processoren; 1 werkt in het huidige proces
+    :return: lijst met (pad, Lagentabel, fout) in de volgorde van paths
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1:
+        return map(_read_bore_worker, paths)
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(_read_bore_worker, paths, chunksize=16)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class Boringen(object):
+    """
+    Lagen van veel boringen in een tabel, voor snelle opvragingen op diepte of niveau over alle boringen.
+    De lagen van boring b staan in de arrays op start[b]:start[b + 1].
+    """
+
+    def __init__(self, tabellen, paden=None):
+        """
+        :param tabellen: lijst met Lagentabel objecten
+        :param paden: namen van de boringen, standaard hun volgnummer
+        """
+        self.paden = list(paden) if paden is not None else range(len(tabellen))
+        self.start = np.concatenate(([0], np.cumsum([len(tabel) for tabel in tabellen]))).astype(np.int64)
+        leeg = np.empty(0)
+        self.boven = np.concatenate([tabel.boven for tabel in tabellen] or [leeg])
+        self.onder = np.concatenate([tabel.onder for tabel in tabellen] or [leeg])
+        self.grondsoort = _tekst_array([]) if not tabellen else \
+            np.concatenate([tabel.grondsoort for tabel in tabellen])
+        self.z = np.array([np.nan if tabel.z is None else tabel.z for tabel in tabellen], dtype=np.float64)
+        # Sleutel voor zoeken in alle boringen tegelijk: diepte plus een verschuiving per boring
+        self._span = float(np.nanmax(np.abs(np.concatenate((self.boven, self.onder, [0]))))) * 2 + 1
+        boring = np.repeat(np.arange(len(tabellen)), np.diff(self.start))
+        self._sleutel = self.boven + boring * self._span
+
+    @classmethod
+    def lees(cls, paths, workers=None):
+        """
+        Leest boringen in met read_bore_many; mislukte bestanden staan daarna in self.fouten als (pad, fout).
+        """
+        resultaten = read_bore_many(paths, workers)
+        boringen = cls([tabel for pad, tabel, fout in resultaten if tabel is not None],
+                       [pad for pad, tabel, fout in resultaten if tabel is not None])
+        boringen.fouten = [(pad, fout) for pad, tabel, fout in resultaten if tabel is None]
+        return boringen
+
+    def __len__(self):
+        return len(self.paden)
+
+    def tabel(self, b):
+        """Geeft de lagen van boring b als lijst met Laag tuples, zonder overige codes."""
+        return [Laag(float(self.boven[i]), float(self.onder[i]), str(self.grondsoort[i]), ())
+                for i in xrange(self.start[b], self.start[b + 1])]
+
+    def laag_index(self, diepte):
+        """
+        Geeft per boring de index (in de samengevoegde arrays) van de laag op een diepte, -1 als er geen is.
+        :param diepte: diepte in m, getal of array met een diepte per boring
+        """
+        d = np.broadcast_to(np.asarray(diepte, dtype=np.float64), (len(self),))
+        i = np.searchsorted(self._sleutel, d + np.arange(len(self)) * self._span, side='right') - 1
+        with np.errstate(invalid='ignore'):
+            binnen = (i >= self.start[:-1]) & (i < self.start[1:]) & (d <= self.onder[np.maximum(i, 0)]) \
+                if len(self.boven) else np.zeros(len(self), dtype=bool)
+        return np.where(binnen, i, -1)
+
+    def grondsoort_op(self, diepte):
+        """Geeft per boring de grondsoort op een diepte (m), '' als er geen laag is."""
+        i = self.laag_index(diepte)
+        if not len(self.grondsoort):
+            return np.full(len(self), '', dtype='S1')
+        return np.where(i >= 0, self.grondsoort[np.maximum(i, 0)], '')
+
+    def grondsoort_op_niveau(self, niveau):
+        """Geeft per boring de grondsoort op een niveau (m t.o.v. het referentievlak van #ZID), '' zonder #ZID."""
+        return self.grondsoort_op(self.z - niveau)
+
+
+if __name__ == '__main__':
+    # Voorbeeld: lagen van een boring
+    import sys
+    tabel = read_bore(sys.argv[1])
+    for laag in tabel:
+        print '{:6.2f} - {:6.2f} m  {:<10} {}'.format(laag.boven, laag.onder, laag.grondsoort, ' '.join(laag.extra))
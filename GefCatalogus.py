@@ -0,0 +1,246 @@
+# Catalogus van gef bestanden in een lokale SQLite database
+# Per bestand worden pad, grootte, mtime, md5 hash en de belangrijkste header gegevens bewaard (rapport type,
+# TESTID, XYID, ZID, datum, LASTSCAN) en per kolom het quantity number. Bij het bijwerken worden alleen
+# bestanden waarvan grootte of mtime veranderd is opnieuw gehasht en gelezen.
+
+import os
+import sqlite3
+import multiprocessing
+from collections import namedtuple
+
+import Gef2Open
+
+# Gegevens per gef bestand; header velden zijn None als ze ontbreken, fout is de leesfout of None
+CatalogusRecord = namedtuple('CatalogusRecord', ['pad', 'map', 'naam', 'grootte', 'mtime', 'hash', 'rapport',
+                                                 'testid', 'x', 'y', 'z', 'datum', 'lastscan', 'fout'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS gef (
+    pad TEXT PRIMARY KEY,
+    map TEXT NOT NULL,
+    naam TEXT NOT NULL,
+    grootte INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    hash TEXT,
+    rapport TEXT,
+    testid TEXT,
+    x REAL,
+    y REAL,
+    z REAL,
+    datum TEXT,
+    lastscan INTEGER,
+    fout TEXT
+);
+CREATE TABLE IF NOT EXISTS kolom (
+    pad TEXT NOT NULL,
+    kolom INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (pad, kolom)
+);
+CREATE INDEX IF NOT EXISTS gef_map ON gef (map);
+CREATE INDEX IF NOT EXISTS gef_naam ON gef (naam);
+CREATE INDEX IF NOT EXISTS gef_hash ON gef (hash);
+CREATE INDEX IF NOT EXISTS gef_testid ON gef (testid);
+CREATE INDEX IF NOT EXISTS gef_rapport ON gef (rapport);
+CREATE INDEX IF NOT EXISTS gef_datum ON gef (datum);
+CREATE INDEX IF NOT EXISTS gef_xy ON gef (x, y);
+CREATE INDEX IF NOT EXISTS kolom_quantity ON kolom (quantity);
+'''
+
+
+def _tekst(waarde):
+    return None if waarde is None else str(waarde)
+
+
+def _lees_bestand(args):
+    """
+    Worker: hasht een bestand en leest de header.
+    :return: (record tuple, lijst met (kolom, quantity))
+    """
+    pad, grootte, mtime = args
+    try:
+        md5 = Gef2Open.file_md5(pad)
+    except (IOError, OSError):
+        md5 = None
+    gef = Gef2Open.Gef2OpenClass(cache=False, verbose=False)
+    naam = os.path.splitext(os.path.basename(pad))[0]
+    if not gef.read_gef(pad, header_only=True):
+        return (pad, os.path.dirname(pad), naam, grootte, mtime, md5) + (None,) * 7 + (gef.fout,), []
+    header = gef.header
+    rapport = None
+    for code in (header.procedurecode, header.reportcode):
+        if code:
+            rapport = str(code[0])
+            break
+    datum = None
+    if header.startdate is not None and len(header.startdate) > 2:
+        try:
+            datum = '{:04d}-{:02d}-{:02d}'.format(*[int(waarde) for waarde in list(header.startdate)[:3]])
+        except (TypeError, ValueError):
+            pass
+    lastscan = None
+    if header.lastscan and isinstance(header.lastscan[0], float):
+        lastscan = int(header.lastscan[0])
+    testid = header.testid[0] if header.testid else None
+    record = (pad, os.path.dirname(pad), naam, grootte, mtime, md5, _tekst(rapport), _tekst(testid),
+              header.x, header.y, header.z, datum, lastscan, None)
+    kolommen = sorted((i_Kol, qn) for qn, i_Kol in gef.quantity_columns.items())
+    return record, kolommen
+
+
+class GefCatalogus(object):
+    """
+    Catalogus van gef bestanden in SQLite (tabellen gef en kolom, zie _SCHEMA). Met update, update_directory
+    en refresh wordt de catalogus incrementeel bijgewerkt; met query kan direct in SQL gezocht worden.
+    """
+
+    def __init__(self, pad=':memory:'):
+        """
+        :param pad: pad naar het database bestand, wordt aangemaakt als het niet bestaat
+        """
+        self.pad = pad
+        self.db = sqlite3.connect(pad)
+        self.db.text_factory = str
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.executescript(_SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM gef').fetchone()[0]
+
+    # Bijwerken
+
+    def update(self, paths, workers=1, verwijderen=()):
+        """
+        Voegt gef bestanden toe of werkt ze bij. Bestanden die al in de catalogus staan met dezelfde
+        grootte en mtime worden overgeslagen; niet (meer) bestaande bestanden worden verwijderd.
+        Alles gebeurt in een transactie.
+        :param paths: lijst met paden naar gef bestanden
+        :param workers: aantal processen voor hashen en lezen; 1 werkt in het huidige proces
+        :param verwijderen: extra paden die uit de catalogus verwijderd moeten worden
+        :return: dict met het aantal nieuwe, gewijzigde, ongewijzigde en verwijderde bestanden en de fouten
+                 als lijst met (pad, fout)
+        """
+        bekend = dict(((pad, (grootte, mtime)) for pad, grootte, mtime in
+                       self.db.execute('SELECT pad, grootte, mtime FROM gef')))
+        taken = []
+        weg = set(verwijderen)
+        n_nieuw = n_ongewijzigd = 0
+        for pad in paths:
+            pad = os.path.abspath(pad)
+            try:
+                st = os.stat(pad)
+            except OSError:
+                weg.add(pad)
+                continue
+            vorige = bekend.get(pad)
+            if vorige is not None and vorige == (st.st_size, st.st_mtime):
+                n_ongewijzigd += 1
+                continue
+            if vorige is None:
+                n_nieuw += 1
+            taken.append((pad, st.st_size, st.st_mtime))
+        weg = [pad for pad in weg if pad in bekend]
+
+        if workers > 1 and len(taken) > 1:
+            pool = multiprocessing.Pool(workers)
+            try:
+                resultaten = list(pool.imap_unordered(_lees_bestand, taken, chunksize=64))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            resultaten = map(_lees_bestand, taken)
+
+        with self.db:
+            self.db.executemany('DELETE FROM gef WHERE pad = ?', ((pad,) for pad in weg))
+            self.db.executemany('DELETE FROM kolom WHERE pad = ?', ((pad,) for pad in weg))
+            self.db.executemany('DELETE FROM kolom WHERE pad = ?', ((pad,) for pad, grootte, mtime in taken))
+            self.db.executemany('INSERT OR REPLACE INTO gef VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (record for record, kolommen in resultaten))
+            self.db.executemany('INSERT INTO kolom VALUES (?, ?, ?)',
+                                ((record[0], i_Kol, qn) for record, kolommen in resultaten
+                                 for i_Kol, qn in kolommen))
+        fouten = sorted((record[0], record[-1]) for record, kolommen in resultaten if record[-1] is not None)
+        return {'nieuw': n_nieuw, 'gewijzigd': len(taken) - n_nieuw, 'ongewijzigd': n_ongewijzigd,
+                'verwijderd': len(weg), 'fouten': fouten}
+
+    def update_directory(self, gefmap, recursive=True, workers=1):
+        """
+        Werkt de catalogus bij met alle .gef bestanden in een map. Bestanden uit de catalogus die in deze
+        map stonden maar niet meer bestaan worden verwijderd.
+        :param gefmap: map met gef bestanden
+        :param recursive: ook submappen doorzoeken
+        :param workers: aantal processen voor hashen en lezen
+        :return: zie update
+        """
+        gefmap = os.path.abspath(gefmap)
+        paden = []
+        for wortel, mappen, bestanden in os.walk(gefmap):
+            paden.extend(os.path.join(wortel, naam) for naam in bestanden if naam.lower().endswith('.gef'))
+            if not recursive:
+                break
+        if recursive:
+            oud = self.db.execute('SELECT pad FROM gef WHERE map = ? OR substr(map, 1, ?) = ?',
+                                  (gefmap, len(gefmap) + 1, gefmap + os.sep))
+        else:
+            oud = self.db.execute('SELECT pad FROM gef WHERE map = ?', (gefmap,))
+        gevonden = set(paden)
+        return self.update(paden, workers=workers, verwijderen=[pad for pad, in oud if pad not in gevonden])
+
+    def refresh(self, workers=1):
+        """Controleert alle bestanden in de catalogus opnieuw en leest alleen gewijzigde bestanden."""
+        return self.update([pad for pad, in self.db.execute('SELECT pad FROM gef')], workers=workers)
+
+    # Zoeken
+
+    def query(self, where='1', params=()):
+        """
+        Geeft CatalogusRecords die voldoen aan een SQL voorwaarde op de tabel gef, gesorteerd op pad.
+        Bv. query("rapport = 'GEF-CPT-Report' AND datum >= ?", ('2015-01-01',))
+        """
+        return [CatalogusRecord(*rij) for rij in
+                self.db.execute('SELECT * FROM gef WHERE {} ORDER BY pad'.format(where), params)]
+
+    def get(self, pad):
+        """Geeft het CatalogusRecord van een bestand, of None."""
+        records = self.query('pad = ?', (os.path.abspath(pad),))
+        return records[0] if records else None
+
+    def quantities(self, pad):
+        """Geeft dict quantity number -> kolom van een bestand."""
+        return dict((qn, i_Kol) for i_Kol, qn in
+                    self.db.execute('SELECT kolom, quantity FROM kolom WHERE pad = ?', (os.path.abspath(pad),)))
+
+    def with_quantity(self, qn):
+        """Geeft de bestanden met een kolom voor een quantity number, bv. 6 (waterspanning u2)."""
+        return self.query('pad IN (SELECT pad FROM kolom WHERE quantity = ?)', (qn,))
+
+    def by_testid(self, testid):
+        return self.query('testid = ?', (testid,))
+
+    def bbox(self, xmin, ymin, xmax, ymax):
+        """Geeft de bestanden met XYID binnen de rechthoek (grenzen inclusief)."""
+        return self.query('x BETWEEN ? AND ? AND y BETWEEN ? AND ?', (xmin, xmax, ymin, ymax))
+
+    def duplicates(self):
+        """Geeft lijsten met paden van bestanden met dezelfde inhoud (md5 hash)."""
+        groepen = {}
+        for md5, pad in self.db.execute('SELECT hash, pad FROM gef WHERE hash IN '
+                                        '(SELECT hash FROM gef WHERE hash IS NOT NULL '
+                                        'GROUP BY hash HAVING COUNT(*) > 1) ORDER BY hash, pad'):
+            groepen.setdefault(md5, []).append(pad)
+        return groepen.values()
+
+
+if __name__ == '__main__':
+    # Voorbeeld: catalogus van een map bijwerken
+    import sys
+    catalogus = GefCatalogus('GefCatalogus.sqlite')
+    print catalogus.update_directory(sys.argv[1] if len(sys.argv) > 1 else '.',
+                                     workers=multiprocessing.cpu_count())
+    print '{} bestanden, {} groepen dubbele bestanden'.format(len(catalogus), len(catalogus.duplicates()))
+    catalogus.close()
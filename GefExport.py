@@ -0,0 +1,251 @@
+# Export van veel sonderingen naar een kolomsgewijze dataset (Parquet of Arrow) voor pandas, DuckDB e.d.
+# Uitvoer in een map:
+#   scans/part-00000.parquet, ...    een rij per scan: file_id, x, y, z, scan en een kolom per quantity number
+#   headers/part-00000.parquet, ...  #MEASUREMENTVAR en #MEASUREMENTTEXT per bestand (lang formaat)
+#   files.parquet                    een rij per bestand: file_id, pad, testid, x, y, z, aantal scans, fout,
+#                                    rapport type
+# Alleen sonderingen (GEF-CPT-Report) komen in scans en headers; andere bestanden staan in files met een fout.
+# Elk proces leest een deel van de bestanden en schrijft zelf de part bestanden van dat deel, zodat het
+# geheugengebruik per proces begrensd blijft tot een deel.
+
+import os
+import time
+import multiprocessing
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is alleen nodig voor export_gefs
+    pa = pq = None
+
+import Gef2Open
+
+# Standaard kolommen in de scans tabel: quantity number -> kolomnaam
+KWANTITEITEN = [
+    (1, 'penetration_length'),
+    (2, 'qc'),
+    (3, 'fs'),
+    (4, 'rf'),
+    (5, 'u1'),
+    (6, 'u2'),
+    (7, 'u3'),
+    (8, 'inclination'),
+    (9, 'inclination_ns'),
+    (10, 'inclination_ew'),
+    (11, 'depth'),
+    (12, 'time'),
+]
+
+# Aantal bestanden per part bestand
+DEEL_GROOTTE = 64
+
+
+def _gef_paden(paths):
+    """Geeft een gesorteerde lijst gef bestanden uit een map (met submappen) of een lijst met paden."""
+    if isinstance(paths, basestring):
+        return sorted(os.path.join(wortel, naam) for wortel, mappen, namen in os.walk(paths)
+                      for naam in namen if naam.lower().endswith('.gef'))
+    return list(paths)
+
+
+def _getallen(waarden):
+    """Zet een float array om naar een Arrow array met null voor NaN."""
+    waarden = np.asarray(waarden, dtype=np.float64)
+    return pa.array(waarden, mask=np.isnan(waarden), type=pa.float64())
+
+
+def _teksten(waarden):
+    """Zet een lijst teksten (bytes, None) om naar een Arrow string array; niet-UTF-8 tekst als latin-1."""
+    uit = []
+    for waarde in waarden:
+        if waarde is not None and not isinstance(waarde, unicode):
+            try:
+                waarde = waarde.decode('utf-8')
+            except UnicodeDecodeError:
+                waarde = waarde.decode('latin-1')
+        uit.append(waarde)
+    return pa.array(uit, type=pa.string())
+
+
+def _schrijf(kolommen, pad, formaat, compressie):
+    """Schrijft een lijst met (kolomnaam, Arrow array) als tabel naar een Parquet of Arrow bestand."""
+    namen, arrays = zip(*kolommen)
+    tabel = pa.Table.from_arrays(list(arrays), names=list(namen))
+    if formaat == 'parquet':
+        pq.write_table(tabel, pad, compression=compressie)
+        return
+    sink = pa.OSFile(pad, 'wb')
+    try:
+        writer = pa.ipc.new_file(sink, tabel.schema) if hasattr(pa, 'ipc') and hasattr(pa.ipc, 'new_file') \
+            else pa.RecordBatchFileWriter(sink, tabel.schema)
+        writer.write_table(tabel)
+        writer.close()
+    finally:
+        sink.close()
+
+
+def _header_rijen(gef, file_id):
+    """
+    Geeft de rijen (file_id, keyword, nummer, waarde, tekst, eenheid, omschrijving) van de header tabel.
+    Tekst, eenheid en omschrijving zijn de teksten uit het bestand (zie get_header_text), waarde het getal.
+    """
+    rijen = []
+    for keyword, veld in (('MEASUREMENTVAR', gef.header.measurementvar),
+                          ('MEASUREMENTTEXT', gef.header.measurementtext)):
+        if veld is None:
+            continue
+        regels = gef.get_header_text(keyword)
+        if Gef2Open.is_fout(regels):
+            regels = {}
+        for nummer, waarden in veld.items():
+            waarden = list(waarden)[1:]
+            teksten = regels[nummer][1:] if nummer in regels else [str(waarde) for waarde in waarden]
+            if keyword == 'MEASUREMENTVAR':
+                waarde = waarden[0] if waarden and isinstance(waarden[0], float) else None
+                tekst = None if waarde is not None or not teksten else teksten[0]
+                eenheid = teksten[1] if len(teksten) > 1 else None
+                omschrijving = ', '.join(teksten[2:]) or None
+            else:
+                waarde = None
+                tekst = teksten[0] if teksten else None
+                eenheid = None
+                omschrijving = ', '.join(teksten[1:]) or None
+            rijen.append((file_id, keyword, int(nummer) if isinstance(nummer, int) else None,
+                          waarde, tekst, eenheid, omschrijving))
+    return rijen
+
+
+def _export_deel(args):
+    """
+    Worker: leest een deel van de bestanden en schrijft de part bestanden voor scans en headers.
+    :return: lijst met (file_id, pad, testid, x, y, z, aantal scans, fout, rapport type) per bestand
+    """
+    nummer, taken, uitvoer, kwantiteiten, formaat, compressie = args
+    extensie = '.parquet' if formaat == 'parquet' else '.arrow'
+    gef = Gef2Open.Gef2OpenClass(cache=False, verbose=False)
+    bestanden = []
+    scans = {'file_id': [], 'x': [], 'y': [], 'z': [], 'scan': []}
+    kolommen = dict((naam, []) for qn, naam in kwantiteiten)
+    headers = []
+    for file_id, pad in taken:
+        if not gef.read_gef(pad, columnar=True):
+            bestanden.append((file_id, pad, None, None, None, None, 0, gef.fout, None))
+            continue
+        header = gef.header
+        testid = gef.get_testid_name() if gef.get_testid_flag() else None
+        testid = None if testid is None else str(testid)
+        rapport = gef.get_report_type()
+        rapport = None if Gef2Open.is_fout(rapport) else rapport
+        if not gef.gcr_is_gcr():
+            bestanden.append((file_id, pad, testid, header.x, header.y, header.z, 0, 'Geen GEF-CPT-Report', rapport))
+            continue
+        datablok = gef.datablok_array
+        n = datablok.shape[0]
+        bestanden.append((file_id, pad, testid, header.x, header.y, header.z, n, None, rapport))
+        scans['file_id'].append(np.full(n, file_id, dtype=np.int32))
+        scans['scan'].append(np.arange(1, n + 1, dtype=np.int32))
+        for naam, waarde in (('x', header.x), ('y', header.y), ('z', header.z)):
+            scans[naam].append(np.full(n, np.nan if waarde is None else waarde))
+        for qn, naam in kwantiteiten:
+            i_Kol = gef.quantity_columns.get(qn)
+            if i_Kol is not None and 0 < i_Kol <= datablok.shape[1]:
+                kolommen[naam].append(datablok[:, i_Kol - 1])
+            else:
+                kolommen[naam].append(np.full(n, np.nan))
+        headers.extend(_header_rijen(gef, file_id))
+
+    bestandsnaam = 'part-{:05d}{}'.format(nummer, extensie)
+    if sum(len(deel) for deel in scans['file_id']):  # geen leeg part bestand als geen bestand scans heeft
+        samen = lambda delen, dtype=np.float64: np.concatenate(delen).astype(dtype)
+        _schrijf([('file_id', pa.array(samen(scans['file_id'], np.int32), type=pa.int32())),
+                  ('x', _getallen(samen(scans['x']))),
+                  ('y', _getallen(samen(scans['y']))),
+                  ('z', _getallen(samen(scans['z']))),
+                  ('scan', pa.array(samen(scans['scan'], np.int32), type=pa.int32()))] +
+                 [(naam_qn, _getallen(samen(kolommen[naam_qn]))) for qn, naam_qn in kwantiteiten],
+                 os.path.join(uitvoer, 'scans', bestandsnaam), formaat, compressie)
+    if headers:
+        kolom = lambda i: [rij[i] for rij in headers]
+        _schrijf([('file_id', pa.array(kolom(0), type=pa.int32())),
+                  ('keyword', _teksten(kolom(1))),
+                  ('number', pa.array(kolom(2), type=pa.int32())),
+                  ('value', pa.array(kolom(3), type=pa.float64())),
+                  ('text', _teksten(kolom(4))),
+                  ('unit', _teksten(kolom(5))),
+                  ('description', _teksten(kolom(6)))],
+                 os.path.join(uitvoer, 'headers', bestandsnaam), formaat, compressie)
+    return bestanden
+
+
+# Purpose: Exporteert een lijst of map Gef bestanden naar een kolomsgewijze dataset
+def export_gefs(paths, uitvoer, formaat='parquet', kwantiteiten=None, workers=None, deel_grootte=DEEL_GROOTTE,
+                compressie='snappy', verbose=False):
+    """
+    Exporteert sonderingen naar een dataset met de tabellen scans, headers en files (zie boven). De delen
+    worden verdeeld over een pool van processen; elk deel van deel_grootte bestanden wordt in een keer
+    gelezen en geschreven.
+    :param paths: map met gef bestanden (inclusief submappen) of een lijst met paden
+    :param uitvoer: map voor de dataset, wordt aangemaakt
+    :param formaat: 'parquet' of 'arrow' (Arrow IPC bestanden)
+    :param kwantiteiten: lijst met (quantity number, kolomnaam) voor de scans tabel, standaard KWANTITEITEN
+    :param workers: aantal processen, standaard het aantal processoren; 1 werkt in het huidige proces
+    :param deel_grootte: aantal bestanden per part bestand
+    :param compressie: compressie voor Parquet, bv. 'snappy', 'zstd' of None
+    :param verbose: een regel met aantal bestanden, duur en aantal fouten printen
+    :return: lijst met (file_id, pad, testid, x, y, z, aantal scans, fout, rapport type) per bestand
+    """
+    if pa is None:
+        raise ImportError('export_gefs vereist pyarrow')
+    if formaat not in ('parquet', 'arrow'):
+        raise ValueError("formaat moet 'parquet' of 'arrow' zijn")
+    if kwantiteiten is None:
+        kwantiteiten = KWANTITEITEN
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    paden = _gef_paden(paths)
+    for submap in (uitvoer, os.path.join(uitvoer, 'scans'), os.path.join(uitvoer, 'headers')):
+        if not os.path.isdir(submap):
+            os.makedirs(submap)
+    taken = list(enumerate(paden))
+    delen = [(nummer, taken[begin:begin + deel_grootte], uitvoer, kwantiteiten, formaat, compressie)
+             for nummer, begin in enumerate(range(0, len(taken), deel_grootte))]
+
+    t0 = time.time()
+    bestanden = []
+    if workers <= 1:
+        for deel in delen:
+            bestanden.extend(_export_deel(deel))
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            for resultaat in pool.imap(_export_deel, delen):
+                bestanden.extend(resultaat)
+        finally:
+            pool.close()
+            pool.join()
+
+    kolom = lambda i: [rij[i] for rij in bestanden]
+    _schrijf([('file_id', pa.array(kolom(0), type=pa.int32())),
+              ('path', _teksten(kolom(1))),
+              ('testid', _teksten(kolom(2))),
+              ('x', pa.array(kolom(3), type=pa.float64())),
+              ('y', pa.array(kolom(4), type=pa.float64())),
+              ('z', pa.array(kolom(5), type=pa.float64())),
+              ('nr_scans', pa.array(kolom(6), type=pa.int64())),
+              ('error', _teksten(kolom(7))),
+              ('report', _teksten(kolom(8)))],
+             os.path.join(uitvoer, 'files.parquet' if formaat == 'parquet' else 'files.arrow'), formaat, compressie)
+    if verbose:
+        duur = time.time() - t0
+        n_fout = sum(1 for rij in bestanden if rij[7] is not None)
+        print 'export_gefs: {} bestanden in {:.2f} s ({:.0f} bestanden/s, {} processen), {} fouten'.format(
+            len(bestanden), duur, len(bestanden) / duur if duur > 0 else 0, workers, n_fout)
+    return bestanden
+
+
+if __name__ == '__main__':
+    # Export van alle gef bestanden in een map: python GefExport.py <gef map> <uitvoer map> [parquet|arrow]
+    import sys
+    export_gefs(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else 'parquet', verbose=True)
@@ -0,0 +1,272 @@
+# Ruimtelijke index over een verzameling gef bestanden op basis van #XYID
+# Alleen de headers worden gelezen (read_gef(..., header_only=True)), nooit de data blokken.
+
+import os
+import math
+import heapq
+import cPickle
+from collections import namedtuple
+
+import Gef2Open
+
+# Gegevens per gef bestand in de index; x, y en z zijn None als #XYID of #ZID ontbreekt;
+# reportcode is het rapport type volgens #PROCEDURECODE of anders #REPORTCODE (bv. 'GEF-CPT-Report')
+GefRecord = namedtuple('GefRecord', ['pad', 'x', 'y', 'z', 'testid', 'reportcode', 'grootte', 'mtime'])
+
+
+def _getal(waarde):
+    return waarde if isinstance(waarde, float) else None
+
+
+def _tekst(waarde):
+    return None if waarde is None or Gef2Open.is_fout(waarde) else str(waarde)
+
+
+def _afstand_tot_segment(x, y, x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+    lengte2 = dx * dx + dy * dy
+    if lengte2 == 0:
+        return math.hypot(x - x1, y - y1)
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / lengte2))
+    return math.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+def _in_polygoon(x, y, coords):
+    binnen = False
+    x1, y1 = coords[-1]
+    for x2, y2 in coords:
+        if (y2 > y) != (y1 > y) and x < (x1 - x2) * (y - y2) / (y1 - y2) + x2:
+            binnen = not binnen
+        x1, y1 = x2, y2
+    return binnen
+
+
+class GefIndex(object):
+    """
+    Ruimtelijke index (regelmatig raster) van gef bestanden op hun XYID coordinaten.
+    Per bestand worden XYID, ZID, TESTID, het rapport type, grootte en mtime bewaard. De index kan
+    met save/load op schijf worden bewaard en met update/refresh incrementeel worden bijgewerkt:
+    alleen bestanden waarvan grootte of mtime veranderd is worden opnieuw gelezen.
+    """
+
+    def __init__(self, celgrootte=250.0):
+        """
+        :param celgrootte: grootte van een rastercel in kaarteenheden (m)
+        """
+        self.celgrootte = float(celgrootte)
+        self.records = {}  # pad -> GefRecord
+        self._raster = {}  # (i, j) -> set met paden
+
+    def __len__(self):
+        return len(self.records)
+
+    # Opbouwen en bijwerken
+
+    def _cel(self, x, y):
+        return int(math.floor(x / self.celgrootte)), int(math.floor(y / self.celgrootte))
+
+    def _voeg_toe(self, record):
+        self._verwijder(record.pad)
+        self.records[record.pad] = record
+        if record.x is not None and record.y is not None:
+            self._raster.setdefault(self._cel(record.x, record.y), set()).add(record.pad)
+
+    def _verwijder(self, pad):
+        record = self.records.pop(pad, None)
+        if record is not None and record.x is not None and record.y is not None:
+            cel = self._cel(record.x, record.y)
+            paden = self._raster.get(cel)
+            if paden is not None:
+                paden.discard(pad)
+                if not paden:
+                    del self._raster[cel]
+
+    def update(self, paths, workers=1):
+        """
+        Voegt gef bestanden toe of werkt ze bij. Bestanden die al in de index staan met dezelfde
+        grootte en mtime worden overgeslagen, behalve als het rapport type nog ontbreekt (bv. uit een
+        index die alleen #REPORTCODE bewaarde); niet (meer) bestaande bestanden worden verwijderd.
+        :param paths: lijst met paden naar gef bestanden
+        :param workers: aantal processen voor het lezen van de headers (zie Gef2Open.read_gef_many)
+        :return: lijst met (pad, fout) voor bestanden die niet gelezen konden worden
+        """
+        te_lezen = {}
+        for pad in paths:
+            pad = os.path.abspath(pad)
+            try:
+                st = os.stat(pad)
+            except OSError:
+                self._verwijder(pad)
+                continue
+            record = self.records.get(pad)
+            if record is None or record.grootte != st.st_size or record.mtime != st.st_mtime or \
+                    record.reportcode is None:
+                te_lezen[pad] = st
+        fouten = []
+        if te_lezen:
+            for resultaat in Gef2Open.read_gef_many(sorted(te_lezen), workers=workers, columnar=False,
+                                                    header_only=True):
+                if resultaat.gef is None:
+                    self._verwijder(resultaat.pad)
+                    fouten.append((resultaat.pad, resultaat.fout))
+                    continue
+                gef = resultaat.gef
+                st = te_lezen[resultaat.pad]
+                self._voeg_toe(GefRecord(resultaat.pad, _getal(gef.get_xyid_X()), _getal(gef.get_xyid_Y()),
+                                         _getal(gef.get_zid_Z()), _tekst(gef.get_testid_name()),
+                                         _tekst(gef.get_report_type()), st.st_size, st.st_mtime))
+        return fouten
+
+    def update_directory(self, gefmap, recursive=True, workers=1):
+        """
+        Werkt de index bij met alle .gef bestanden in een map. Bestanden uit de index die in deze map
+        stonden maar niet meer bestaan worden verwijderd.
+        :param gefmap: map met gef bestanden
+        :param recursive: ook submappen doorzoeken
+        :param workers: aantal processen voor het lezen van de headers
+        :return: lijst met (pad, fout) voor bestanden die niet gelezen konden worden
+        """
+        gefmap = os.path.abspath(gefmap)
+        paden = []
+        for wortel, mappen, bestanden in os.walk(gefmap):
+            paden.extend(os.path.join(wortel, naam) for naam in bestanden if naam.lower().endswith('.gef'))
+            if not recursive:
+                break
+        gevonden = set(paden)
+        for pad in self.records.keys():
+            if pad.startswith(gefmap + os.sep) and pad not in gevonden:
+                if recursive or os.path.dirname(pad) == gefmap:
+                    self._verwijder(pad)
+        return self.update(paden, workers=workers)
+
+    def refresh(self, workers=1):
+        """Controleert alle bestanden in de index opnieuw en leest alleen gewijzigde bestanden."""
+        return self.update(self.records.keys(), workers=workers)
+
+    # Zoeken
+
+    def _kandidaten(self, xmin, ymin, xmax, ymax):
+        i_min, j_min = self._cel(xmin, ymin)
+        i_max, j_max = self._cel(xmax, ymax)
+        if (i_max - i_min + 1) * (j_max - j_min + 1) > len(self._raster):
+            cellen = [cel for cel in self._raster if i_min <= cel[0] <= i_max and j_min <= cel[1] <= j_max]
+        else:
+            cellen = [(i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)]
+        for cel in cellen:
+            for pad in self._raster.get(cel, ()):
+                yield self.records[pad]
+
+    def bbox(self, xmin, ymin, xmax, ymax):
+        """
+        :return: lijst met GefRecords binnen de rechthoek (grenzen inclusief)
+        """
+        return [r for r in self._kandidaten(xmin, ymin, xmax, ymax)
+                if xmin <= r.x <= xmax and ymin <= r.y <= ymax]
+
+    def radius(self, x, y, r):
+        """
+        :return: lijst met (afstand, GefRecord) binnen afstand r van (x, y), oplopend op afstand
+        """
+        uit = []
+        for record in self._kandidaten(x - r, y - r, x + r, y + r):
+            afstand = math.hypot(record.x - x, record.y - y)
+            if afstand <= r:
+                uit.append((afstand, record))
+        uit.sort()
+        return uit
+
+    def nearest(self, x, y, k=1):
+        """
+        Zoekt de k dichtstbijzijnde bestanden door in ringen van rastercellen rond (x, y) te zoeken.
+        :return: lijst met (afstand, GefRecord), oplopend op afstand
+        """
+        if not self._raster or k < 1:
+            return []
+        i0, j0 = self._cel(x, y)
+        i_min = min(cel[0] for cel in self._raster)
+        i_max = max(cel[0] for cel in self._raster)
+        j_min = min(cel[1] for cel in self._raster)
+        j_max = max(cel[1] for cel in self._raster)
+        max_ring = max(i0 - i_min, i_max - i0, j0 - j_min, j_max - j0)
+        beste = []  # max-heap via negatieve afstand
+        ring = 0
+        while ring <= max_ring:
+            for i in range(i0 - ring, i0 + ring + 1):
+                for j in range(j0 - ring, j0 + ring + 1):
+                    if max(abs(i - i0), abs(j - j0)) != ring:
+                        continue
+                    for pad in self._raster.get((i, j), ()):
+                        record = self.records[pad]
+                        afstand = math.hypot(record.x - x, record.y - y)
+                        if len(beste) < k:
+                            heapq.heappush(beste, (-afstand, pad))
+                        elif afstand < -beste[0][0]:
+                            heapq.heapreplace(beste, (-afstand, pad))
+            # alles buiten deze ring ligt minstens ring * celgrootte weg
+            if len(beste) == k and -beste[0][0] <= ring * self.celgrootte:
+                break
+            ring += 1
+        return sorted((-afstand, self.records[pad]) for afstand, pad in beste)
+
+    def along_line(self, coords, afstand):
+        """
+        :param coords: lijst met (x, y) punten van een lijn (bv. een trace)
+        :param afstand: maximale afstand tot de lijn
+        :return: lijst met (afstand, GefRecord) binnen afstand van de lijn, oplopend op afstand
+        """
+        gevonden = {}
+        for (x1, y1), (x2, y2) in zip(coords[:-1], coords[1:]):
+            for record in self._kandidaten(min(x1, x2) - afstand, min(y1, y2) - afstand,
+                                           max(x1, x2) + afstand, max(y1, y2) + afstand):
+                d = _afstand_tot_segment(record.x, record.y, x1, y1, x2, y2)
+                if d <= afstand and d < gevonden.get(record.pad, (afstand + 1,))[0]:
+                    gevonden[record.pad] = (d, record)
+        return sorted(gevonden.values())
+
+    def in_polygon(self, coords):
+        """
+        :param coords: lijst met (x, y) hoekpunten van een polygoon
+        :return: lijst met GefRecords binnen de polygoon
+        """
+        xs = [c[0] for c in coords]
+        ys = [c[1] for c in coords]
+        return [r for r in self._kandidaten(min(xs), min(ys), max(xs), max(ys)) if _in_polygoon(r.x, r.y, coords)]
+
+    # Opslaan
+
+    def save(self, pad):
+        """Bewaart de index in een bestand (pickle), via een tijdelijk bestand."""
+        tijdelijk = pad + '.tmp'
+        f = open(tijdelijk, 'wb')
+        try:
+            cPickle.dump((self.celgrootte, [tuple(r) for r in self.records.values()]), f, 2)
+        finally:
+            f.close()
+        if os.path.exists(pad):
+            os.remove(pad)
+        os.rename(tijdelijk, pad)
+
+    @classmethod
+    def load(cls, pad):
+        """Laadt een met save bewaarde index; het raster wordt opnieuw opgebouwd."""
+        f = open(pad, 'rb')
+        try:
+            celgrootte, records = cPickle.load(f)
+        finally:
+            f.close()
+        index = cls(celgrootte)
+        for record in records:
+            index._voeg_toe(GefRecord(*record))
+        return index
+
+
+if __name__ == '__main__':
+    # Voorbeeld: index opbouwen of bijwerken en de 5 dichtstbijzijnde sonderingen opvragen
+    import sys
+    indexbestand = 'GefIndex.pkl'
+    index = GefIndex.load(indexbestand) if os.path.exists(indexbestand) else GefIndex()
+    index.update_directory(sys.argv[1] if len(sys.argv) > 1 else '.')
+    index.save(indexbestand)
+    for afstand, record in index.nearest(114465.0, 478687.0, k=5):
+        print '{:.1f} m: {} ({})'.format(afstand, record.testid, record.pad)
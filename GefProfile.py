@@ -0,0 +1,153 @@
+import math
+
+import ezdxf
+import numpy as np
+
+import Gef2DXFBatch
+import Gef2Open
+
+# Default profile layout: the batch layout without raster, written compact
+PROFILE_LAYOUT = dict(Gef2DXFBatch.DEFAULT_LAYOUT, raster=None, compact=True)
+
+
+def project_on_alignment(coords, x, y):
+    """
+    Project a point on a polyline alignment
+    :param coords: list of (x, y) vertices of the alignment
+    :param x: X coordinate of the point
+    :param y: Y coordinate of the point
+    :return: (chainage, offset) in map units; the offset is positive left of the alignment direction
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    x1, y1 = coords[:-1, 0], coords[:-1, 1]
+    dx, dy = np.diff(coords[:, 0]), np.diff(coords[:, 1])
+    lengths = np.hypot(dx, dy)
+    lengths2 = np.where(lengths > 0, lengths * lengths, 1)
+    t = np.clip(((x - x1) * dx + (y - y1) * dy) / lengths2, 0, 1)
+    distances = np.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+    i = int(np.argmin(distances))
+    chainage = lengths[:i].sum() + t[i] * lengths[i]
+    side = 1 if dx[i] * (y - y1[i]) - dy[i] * (x - x1[i]) >= 0 else -1
+    return float(chainage), float(side * distances[i])
+
+
+class GefProfile(object):
+    """
+    Longitudinal section of many GEF files along an alignment.
+    Every GEF file is placed at its chainage (from XYID) and at its surface level (ZID) and all graphs
+    are drawn into one drawing, sharing layers and the sounding marker block.
+    """
+
+    def __init__(self, alignment, layout=None, horizontal_factor=1.0, max_offset=None):
+        """
+        Initialise the profile
+        :param alignment: list of (x, y) vertices of the alignment in map units
+        :param layout: layout dictionary for the graphs, see Gef2DXFBatch.DEFAULT_LAYOUT; default PROFILE_LAYOUT
+        :param horizontal_factor: scale factor for plotting chainage
+        :param max_offset: GEF files further from the alignment are skipped, None for no limit
+        """
+        if len(alignment) < 2:
+            raise ValueError('An alignment needs at least two vertices.')
+        self.alignment = [(float(x), float(y)) for x, y in alignment]
+        self.layout = PROFILE_LAYOUT if layout is None else layout
+        self.horizontal_factor = horizontal_factor
+        self.max_offset = max_offset
+        self.length = sum(math.hypot(x2 - x1, y2 - y1)
+                          for (x1, y1), (x2, y2) in zip(self.alignment[:-1], self.alignment[1:]))
+        self.stations = []  # (chainage, offset, z, name, gef)
+        self.skipped = []  # (name, reason)
+
+    def add(self, gef, name=None):
+        """
+        Add a GEF file to the profile
+        :param gef: a Gef2OpenClass object with a properly processed GEF file
+        :param name: label of the sounding, default the TESTID
+        :return: (chainage, offset) or None when the GEF file is skipped (see self.skipped)
+        """
+        if name is None:
+            name = gef.get_testid_name()
+            if Gef2Open.is_fout(name):
+                name = ''
+        x, y, z = gef.get_xyid_X(), gef.get_xyid_Y(), gef.get_zid_Z()
+        if not isinstance(x, float) or not isinstance(y, float):
+            self.skipped.append((name, 'no XYID'))
+            return None
+        if not isinstance(z, float):
+            self.skipped.append((name, 'no ZID'))
+            return None
+        chainage, offset = project_on_alignment(self.alignment, x, y)
+        if self.max_offset is not None and abs(offset) > self.max_offset:
+            self.skipped.append((name, 'offset {:.1f} m'.format(offset)))
+            return None
+        self.stations.append((chainage, offset, z, name, gef))
+        return chainage, offset
+
+    def add_many(self, gefs):
+        """
+        Add many GEF files, e.g. the results of Gef2Open.read_gef_many
+        :param gefs: iterable with Gef2OpenClass objects or GefResultaat tuples
+        """
+        for gef in gefs:
+            if hasattr(gef, 'gef'):  # GefResultaat
+                if gef.gef is None:
+                    self.skipped.append((gef.pad, gef.fout))
+                    continue
+                gef = gef.gef
+            self.add(gef)
+
+    def render(self, drawing=None, label_height=0.5):
+        """
+        Draw all soundings, the surface line and the NAP reference line in one pass
+        :param drawing: existing ezdxf drawing to draw into, a new drawing is created if None
+        :param label_height: height of the sounding labels in map units
+        :return: the ezdxf drawing
+        """
+        if drawing is None:
+            drawing = ezdxf.new(dxfversion='AC1024')
+        modelspace = drawing.modelspace()
+        depth_factor = self.layout.get('depth_factor', 1)
+
+        layername = 'GEF Profile'
+        if layername not in drawing.layers:
+            drawing.layers.new(name=layername, dxfattribs={'color': 0})
+        blockname = 'GEF_SOUNDING'
+        if blockname not in drawing.blocks:
+            block = drawing.blocks.new(name=blockname)
+            block.add_lwpolyline([(0, 0), (-0.5, 0.75), (0.5, 0.75)], dxfattribs={'layer': '0', 'closed': True})
+
+        surface = []
+        for chainage, offset, z, name, gef in sorted(self.stations, key=lambda station: station[0]):
+            x = chainage * self.horizontal_factor
+            y = z * depth_factor
+            Gef2DXFBatch.render_gef(gef, self.layout, drawing=drawing, origin=(x, y))
+            modelspace.add_blockref(blockname, (x, y), dxfattribs={'layer': layername})
+            text = modelspace.add_text(name, dxfattribs={'layer': layername, 'height': label_height})
+            text.set_pos((x, y + 1.5 * label_height), align='BOTTOM_CENTER')
+            surface.append((x, y))
+
+        # Surface line through the tops of the soundings and NAP reference line over the alignment
+        if len(surface) > 1:
+            modelspace.add_lwpolyline(surface, dxfattribs={'layer': layername})
+        modelspace.add_line((0, 0), (self.length * self.horizontal_factor, 0), dxfattribs={'layer': layername})
+        text = modelspace.add_text('NAP', dxfattribs={'layer': layername, 'height': label_height})
+        text.set_pos((0, 0), align='MIDDLE_RIGHT')
+        return drawing
+
+    def save(self, path, label_height=0.5):
+        """
+        Render the profile into a new drawing and save it as DXF
+        :param path: file path
+        """
+        self.render(label_height=label_height).saveas(path)
+
+
+if __name__ == '__main__':
+    # Longitudinal section of all GEF files in a directory along an alignment:
+    # python GefProfile.py <gef dir> <output.dxf> x1,y1 x2,y2 [...]
+    import sys
+    profile = GefProfile([map(float, vertex.split(',')) for vertex in sys.argv[3:]])
+    profile.add_many(Gef2Open.read_gef_many(Gef2DXFBatch.gef_paths(sys.argv[1]), columnar=True,
+                                             verbose=True))
+    profile.save(sys.argv[2])
+    for name, reason in profile.skipped:
+        print 'skipped {}: {}'.format(name, reason)
@@ -0,0 +1,196 @@
+# Automatische laagindeling van sonderingen met change-point detectie
+# Binaire segmentatie op cumulatieve sommen: de kosten (kwadratische afwijking van het laaggemiddelde) van elk
+# deel van het profiel volgen uit prefix sommen, zodat de beste splitsing van een deel in O(n) gevonden wordt
+# en de hele indeling in O(n log n).
+
+import multiprocessing
+from collections import namedtuple
+
+import numpy as np
+
+import Gef2Open
+
+# Een laag: diepte boven en onder (m), aantal scans en per kenmerk een dict met mean, std, min en max
+Laag = namedtuple('Laag', ['boven', 'onder', 'n', 'statistieken'])
+
+# Kenmerken waarop standaard gesegmenteerd wordt: log10(qc) en het wrijvingsgetal Rf
+STANDAARD_KENMERKEN = ('log_qc', 'Rf')
+
+
+def _ruis(x, lag):
+    """
+    Schatting van de standaardafwijking van de variatie binnen een laag uit de mediaan van de absolute
+    verschillen (MAD) over lag scans. Sondeersignalen zijn sterk gecorreleerd, de verschillen tussen
+    naburige scans onderschatten de variatie binnen een laag daarom sterk.
+    """
+    lag = min(lag, len(x) - 1)
+    if lag < 1:
+        return 1.0
+    ruis = 1.4826 * np.median(np.abs(x[lag:] - x[:-lag])) / np.sqrt(2)
+    return ruis if ruis > 0 else (np.std(x) or 1.0)
+
+
+def segmenteer(waarden, penalty=None, min_grootte=10, max_segmenten=None):
+    """
+    Binaire segmentatie van een (multivariate) reeks op verandering van het gemiddelde.
+    Elk kenmerk wordt geschaald met de variatie over min_grootte scans; een deel wordt gesplitst zolang de
+    afname van de kosten groter is dan penalty. Het deel met de grootste winst wordt steeds als eerste gesplitst.
+    :param waarden: 1-D array of 2-D array (scans x kenmerken) zonder NaN
+    :param penalty: minimale kostenafname voor een splitsing, standaard 50 * kenmerken * ln(n)
+    :param min_grootte: minimaal aantal scans per segment
+    :param max_segmenten: maximaal aantal segmenten, None voor geen maximum
+    :return: gesorteerde array met de grenzen (scan indices), beginnend met 0 en eindigend met n
+    """
+    x = np.asarray(waarden, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, np.newaxis]
+    n, d = x.shape
+    if n == 0:
+        return np.array([0], dtype=int)
+    min_grootte = max(int(min_grootte), 1)
+    x = x / np.array([_ruis(x[:, j], min_grootte) for j in range(d)])
+    if penalty is None:
+        penalty = 50.0 * d * np.log(max(n, 2))
+
+    som = np.vstack((np.zeros(d), np.cumsum(x, axis=0)))
+    som2 = np.vstack((np.zeros(d), np.cumsum(x * x, axis=0)))
+
+    def kosten(a, b):
+        """Kosten van segmenten [a, b) voor arrays a en b (gevectoriseerd)."""
+        lengte = (b - a)[:, np.newaxis]
+        s = som[b] - som[a]
+        return (som2[b] - som2[a] - s * s / lengte).sum(axis=1)
+
+    def beste_splitsing(a, b):
+        k = np.arange(a + min_grootte, b - min_grootte + 1)
+        if not len(k):
+            return None
+        a_ = np.full(len(k), a)
+        b_ = np.full(len(k), b)
+        winst = kosten(np.array([a]), np.array([b]))[0] - kosten(a_, k) - kosten(k, b_)
+        i = int(np.argmax(winst))
+        return winst[i], int(k[i])
+
+    grenzen = [0, n]
+    kandidaten = []  # (winst, a, b, k)
+    splitsing = beste_splitsing(0, n)
+    if splitsing is not None:
+        kandidaten.append((splitsing[0], 0, n, splitsing[1]))
+    while kandidaten:
+        if max_segmenten is not None and len(grenzen) - 1 >= max_segmenten:
+            break
+        i = max(range(len(kandidaten)), key=lambda j: kandidaten[j][0])
+        winst, a, b, k = kandidaten.pop(i)
+        if winst <= penalty:
+            break
+        grenzen.append(k)
+        for a2, b2 in ((a, k), (k, b)):
+            splitsing = beste_splitsing(a2, b2)
+            if splitsing is not None:
+                kandidaten.append((splitsing[0], a2, b2, splitsing[1]))
+    return np.array(sorted(grenzen), dtype=int)
+
+
+def kenmerken(gef, namen=STANDAARD_KENMERKEN):
+    """
+    Geeft diepte en kenmerken van een sondering, zonder rijen met nodata.
+    :param gef: Gef2OpenClass object met een ingelezen sondering
+    :param namen: kenmerken: 'qc', 'log_qc', 'fs', 'Rf' (fs/qc in %), 'u2' of een naam uit get_derived (bv. 'Ic')
+    :return: (diepte, 2-D array scans x kenmerken)
+    :raises ValueError: als het bestand geen sondering is of qc of fs ontbreekt
+    """
+    if not gef.gcr_is_gcr():
+        raise ValueError('Geen GEF-CPT-Report')
+    afgeleid = gef.get_derived()
+    if isinstance(afgeleid, str):
+        raise ValueError('Sondering zonder qc of fs: {}'.format(afgeleid))
+    kolommen = []
+    for naam in namen:
+        if naam in ('qc', 'log_qc', 'fs', 'u2'):
+            i_Kol = gef.quantity_columns.get({'qc': 2, 'log_qc': 2, 'fs': 3, 'u2': 6}[naam])
+            kolom = None if i_Kol is None else gef.get_column_values(i_Kol)
+            if kolom is None:
+                raise ValueError('Kolom voor {} ontbreekt'.format(naam))
+            if naam == 'log_qc':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    kolom = np.log10(np.where(kolom > 0, kolom, np.nan))
+        else:
+            kolom = afgeleid[naam]
+        kolommen.append(kolom)
+    diepte = afgeleid['depth']
+    x = np.column_stack(kolommen)
+    geldig = ~np.isnan(diepte) & ~np.isnan(x).any(axis=1)
+    return diepte[geldig], x[geldig]
+
+
+def segmenteer_gef(gef, namen=STANDAARD_KENMERKEN, penalty=None, min_dikte=0.2, max_lagen=None):
+    """
+    Deelt een sondering op in lagen.
+    :param gef: Gef2OpenClass object met een ingelezen sondering
+    :param namen: kenmerken waarop gesegmenteerd wordt, zie kenmerken
+    :param penalty: zie segmenteer
+    :param min_dikte: minimale laagdikte in m, omgerekend naar scans met de mediane scanafstand
+    :param max_lagen: maximaal aantal lagen
+    :return: lijst met Laag tuples van boven naar beneden; de grens tussen twee lagen ligt halverwege
+             de laatste scan van de bovenste en de eerste scan van de onderste laag
+
+    :raises ValueError: als het bestand geen sondering is of qc of fs ontbreekt, zie kenmerken
+    """
+    diepte, x = kenmerken(gef, namen)
+    if not len(diepte):
+        return []
+    stap = np.median(np.diff(diepte)) if len(diepte) > 1 else 0
+    min_grootte = int(round(min_dikte / stap)) if stap > 0 else 1
+    grenzen = segmenteer(x, penalty, min_grootte, max_lagen)
+    lagen = []
+    for a, b in zip(grenzen[:-1], grenzen[1:]):
+        boven = diepte[0] if a == 0 else (diepte[a - 1] + diepte[a]) / 2
+        onder = diepte[-1] if b == len(diepte) else (diepte[b - 1] + diepte[b]) / 2
+        deel = x[a:b]
+        statistieken = dict((naam, {'mean': float(deel[:, j].mean()), 'std': float(deel[:, j].std()),
+                                    'min': float(deel[:, j].min()), 'max': float(deel[:, j].max())})
+                            for j, naam in enumerate(namen))
+        lagen.append(Laag(float(boven), float(onder), int(b - a), statistieken))
+    return lagen
+
+
+def _segmenteer_worker(args):
+    pad, namen, penalty, min_dikte, max_lagen = args
+    gef = Gef2Open.Gef2OpenClass(verbose=False)
+    if not gef.read_gef(pad, columnar=True):
+        return pad, None, gef.fout
+    try:
+        return pad, segmenteer_gef(gef, namen, penalty, min_dikte, max_lagen), None
+    except ValueError as e:
+        return pad, None, str(e)
+
+
+def segmenteer_many(paths, namen=STANDAARD_KENMERKEN, penalty=None, min_dikte=0.2, max_lagen=None, workers=None):
+    """
+    Deelt een lijst sonderingen op in lagen, verdeeld over een pool van processen.
+    :param paths: lijst met paden naar gef bestanden
+    :param workers: aantal processen, standaard het aantal processoren; 1 werkt in het huidige proces
+    :return: lijst met (pad, lagen, fout) in de volgorde van paths; lagen is None als het bestand niet gelezen
+             kon worden of geen sondering is, fout geeft dan de reden
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    taken = [(pad, namen, penalty, min_dikte, max_lagen) for pad in paths]
+    if workers <= 1:
+        return map(_segmenteer_worker, taken)
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(_segmenteer_worker, taken, chunksize=16)
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+    # Voorbeeld: laagindeling van een sondering
+    import sys
+    myGef = Gef2Open.Gef2OpenClass()
+    myGef.read_gef(sys.argv[1] if len(sys.argv) > 1 else 'GEFTEST01.gef', columnar=True)
+    for laag in segmenteer_gef(myGef):
+        print '{:6.2f} - {:6.2f} m  qc {:6.2f} MPa  Rf {:5.2f} %'.format(
+            laag.boven, laag.onder, 10 ** laag.statistieken['log_qc']['mean'], laag.statistieken['Rf']['mean'])
@@ -0,0 +1,77 @@
+# Benchmark voor het tekenen van sonderingen naar DXF met Gef2DXF, standaard en compact (LWPOLYLINE).
+# Gebruik: python BenchGef2DXF.py [aantal sonderingen] [aantal rijen]
+# Alle sonderingen worden als tegels in een tekening geplaatst (Gef2DXFBatch.render_gef).
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import Gef2Open
+import Gef2DXFBatch
+from BenchGef2Open import maak_testbestand
+
+import ezdxf
+
+
+def tel_entiteiten(pad):
+    """Telt de entiteiten in de ENTITIES sectie van een DXF bestand, inclusief VERTEX entiteiten."""
+    aantal = 0
+    sectie = None
+    vorige = None
+    f = open(pad, 'rb')
+    regels = iter(f)
+    for code in regels:
+        code = code.strip()
+        waarde = next(regels).strip()
+        if code == '2' and vorige == 'SECTION':
+            sectie = waarde
+        elif code == '0' and sectie == 'ENTITIES' and waarde not in ('ENDSEC', 'SEQEND'):
+            aantal += 1
+        vorige = waarde if code == '0' else None
+    f.close()
+    return aantal
+
+
+def bench_blad(gef, sonderingen, layout):
+    """
+    Tekent dezelfde sondering een aantal keer als tegels in een tekening en slaat die op.
+    :return: (entiteiten, bytes, teken tijd, opslaan tijd)
+    """
+    links, rechts = Gef2DXFBatch.layout_extent(layout)
+    breedte = links + rechts + 2.0
+    hoogte = gef.get_data(1, int(gef.get_nr_scans())) + 2.0
+    t0 = time.time()
+    tekening = ezdxf.new(dxfversion='AC1024')
+    for nummer in range(sonderingen):
+        oorsprong = (links + (nummer % 10) * breedte, -(nummer // 10) * hoogte)
+        Gef2DXFBatch.render_gef(gef, layout, drawing=tekening, origin=oorsprong)
+    t1 = time.time()
+    fd, pad = tempfile.mkstemp(suffix='.dxf')
+    os.close(fd)
+    try:
+        tekening.saveas(pad)
+        t2 = time.time()
+        return tel_entiteiten(pad), os.path.getsize(pad), t1 - t0, t2 - t1
+    finally:
+        os.remove(pad)
+
+
+if __name__ == '__main__':
+    sonderingen = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rijen = int(sys.argv[2]) if len(sys.argv) > 2 else 2004
+    pad = maak_testbestand(rijen)
+    try:
+        gef = Gef2Open.Gef2OpenClass()
+        gef.read_gef(pad, columnar=Gef2Open.np is not None)
+        for naam, opties in [('standaard', {}),
+                             ('compact', {'compact': True}),
+                             ('compact + simplify 0.01', {'compact': True, 'simplify_tolerance': 0.01})]:
+            layout = dict(Gef2DXFBatch.DEFAULT_LAYOUT, **opties)
+            entiteiten, grootte, tekenen, opslaan = bench_blad(gef, sonderingen, layout)
+            print '{}: {} entiteiten, {:.1f} MB, tekenen {:.2f} s, opslaan {:.2f} s'.format(
+                naam, entiteiten, grootte / 1048576.0, tekenen, opslaan)
+    finally:
+        os.remove(pad)
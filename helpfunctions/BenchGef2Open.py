@@ -0,0 +1,156 @@
+# Benchmark voor het inlezen van (grote) gef bestanden met Gef2Open.
+# Gebruik: python BenchGef2Open.py [aantal rijen]
+#          python BenchGef2Open.py --geheugen <methode> <pad>  (intern, meet piekgeheugen van een methode)
+# Het testbestand wordt opgeschaald uit GEFTEST01.gef in de hoofdmap.
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import resource
+import subprocess
+import multiprocessing
+import Gef2Open
+
+GEFTEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GEFTEST01.gef')
+
+
+def maak_testbestand(rijen, bron=GEFTEST):
+    """
+    Schaalt het datablok van een gef bestand op tot het gegeven aantal rijen.
+    :param rijen: aantal rijen in het datablok
+    :param bron: gef bestand waarvan header en dataregels worden gebruikt
+    :return: pad naar een tijdelijk gef bestand
+    """
+    f = open(bron, 'rb')
+    regels = f.readlines()
+    f.close()
+    for eoh, regel in enumerate(regels):
+        if regel.startswith('#EOH'):
+            break
+    header = ''.join(regels[:eoh + 1]).replace('#LASTSCAN= 2004', '#LASTSCAN= %d' % rijen)
+    data = [r for r in regels[eoh + 1:] if r.strip()]
+    fd, pad = tempfile.mkstemp(suffix='.gef')
+    uit = os.fdopen(fd, 'wb')
+    uit.write(header)
+    for i in range(rijen):
+        uit.write(data[i % len(data)])
+    uit.close()
+    return pad
+
+
+def meet(functie, *args, **kwargs):
+    """Geeft de kortste looptijd (s) van drie aanroepen van functie."""
+    tijden = []
+    for i in range(3):
+        t0 = time.time()
+        functie(*args, **kwargs)
+        tijden.append(time.time() - t0)
+    return min(tijden)
+
+
+def bench_read_gef(pad):
+    gef = Gef2Open.Gef2OpenClass()
+    t = meet(gef.read_gef, pad)
+    print 'read_gef: {:.3f} s ({} rijen)'.format(t, len(gef.datablok))
+
+
+def bench_read_gef_columnar(pad):
+    gef = Gef2Open.Gef2OpenClass()
+    t = meet(gef.read_gef, pad, columnar=True)
+    print 'read_gef columnar: {:.3f} s ({} rijen)'.format(t, gef.get_nr_scans())
+
+
+def bench_header_only(pad):
+    gef = Gef2Open.Gef2OpenClass()
+    t = meet(gef.read_gef, pad, header_only=True)
+    print 'read_gef header_only: {:.3f} s'.format(t)
+
+
+def bench_iter_rows(pad):
+    gef = Gef2Open.Gef2OpenClass()
+    t = meet(lambda: sum(1 for rij in gef.iter_rows(pad, columns=[1, 2])))
+    print 'iter_rows: {:.3f} s'.format(t)
+
+
+def bench_read_gef_mmap(pad):
+    gef = Gef2Open.Gef2OpenClass()
+    t = meet(gef.read_gef_mmap, pad)
+    print 'read_gef_mmap: {:.3f} s ({} rijen)'.format(t, gef.get_nr_scans())
+
+
+def bench_read_gef_many(aantal=200):
+    """Leest aantal kopieen van GEFTEST01.gef met 1 proces en met alle processoren."""
+    paden = [maak_testbestand(2004) for i in range(aantal)]
+    try:
+        for workers in sorted(set([1, multiprocessing.cpu_count()])):
+            Gef2Open.read_gef_many(paden, workers=workers, verbose=True)
+    finally:
+        for pad in paden:
+            os.remove(pad)
+
+
+def bench_cache(pad):
+    """Vergelijkt inlezen zonder cache (koud) met inlezen uit een GefCache in een nieuw object (warm)."""
+    map = tempfile.mkdtemp()
+    try:
+        cache = Gef2Open.GefCache(map)
+        koud = meet(lambda: Gef2Open.Gef2OpenClass(cache=False).read_gef(pad, columnar=True))
+        Gef2Open.Gef2OpenClass(cache=cache).read_gef(pad, columnar=True)
+        warm = meet(lambda: Gef2Open.Gef2OpenClass(cache=Gef2Open.GefCache(map)).read_gef(pad, columnar=True))
+        print 'cache: koud {:.4f} s, warm {:.4f} s ({:.0f}x)'.format(koud, warm, koud / warm)
+    finally:
+        shutil.rmtree(map)
+
+
+def lees_met(methode, pad):
+    gef = Gef2Open.Gef2OpenClass()
+    if methode == 'read_gef':
+        gef.read_gef(pad)
+    elif methode == 'columnar':
+        gef.read_gef(pad, columnar=True)
+    elif methode == 'mmap':
+        gef.read_gef_mmap(pad)
+    return gef
+
+
+def piekgeheugen(methode, pad):
+    """Leest pad in een nieuw proces in met methode en geeft het piekgeheugen (MB) van dat proces."""
+    uit = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--geheugen', methode, pad])
+    return float(uit.split()[-1])
+
+
+def bench_geheugen(pad):
+    basis = piekgeheugen('leeg', pad)
+    print 'bestand: {:.1f} MB, interpreter: {:.1f} MB'.format(os.path.getsize(pad) / 1048576.0, basis)
+    for methode in ['read_gef', 'columnar', 'mmap']:
+        print 'piekgeheugen {}: +{:.1f} MB'.format(methode, piekgeheugen(methode, pad) - basis)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--geheugen':
+        gef = lees_met(sys.argv[2], sys.argv[3])
+        if os.path.exists('/proc/self/status'):  # ru_maxrss neemt na fork het geheugen van de ouder mee
+            for regel in open('/proc/self/status'):
+                if regel.startswith('VmHWM'):
+                    print int(regel.split()[1]) / 1024.0
+        else:
+            print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        sys.exit(0)
+
+    rijen = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pad = maak_testbestand(rijen)
+    try:
+        bench_read_gef(pad)
+        if Gef2Open.np is not None:
+            bench_read_gef_columnar(pad)
+            bench_read_gef_mmap(pad)
+            bench_cache(pad)
+        bench_header_only(pad)
+        bench_iter_rows(pad)
+        if Gef2Open.np is not None:
+            bench_geheugen(pad)
+        bench_read_gef_many()
+    finally:
+        os.remove(pad)
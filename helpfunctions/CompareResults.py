@@ -1,11 +1,10 @@
 import os
-import hashlib
-import ast
 from random import randint
 import pickle
 import re
 import UtlGef
 import Gef2Open,Gef2Config
+import GefCatalogus
 
 def randList(cnt):
 	tel=0;mylst=[]
@@ -26,7 +25,7 @@ def tryUtlGef(functie):
 
 def tryGef2Open(functie):
 	myResult = eval('Gef2Open.%s'%(functie))
-	if myResult not in [None,False,True] and 'Error:' in str(myResult):
+	if Gef2Open.is_fout(myResult):
 		myResult=None
 	try:
 		return myResult 
@@ -93,46 +92,26 @@ def CompareGefTools(gefbestand,gefnaam,function):
 		return 'ergaatietsfoutin %s'%(gefnaam)
 
 def getBestanden(mylocs):
-	MyGefFiles = open('MyGefFiles.txt','w')
-	MyGefFiles.write('{')
-	MyGefFiles.close()
-	mygefs1=[];myhashes=[];
-	tel=0
+	# Catalogus in SQLite: bij een volgende run worden alleen gewijzigde bestanden opnieuw gehasht
+	catalogus = GefCatalogus.GefCatalogus('MyGefFiles.sqlite')
+	mygefs1=set();myhashes=set();mydict={}
 	for myloc in mylocs:
-		myfiles=os.listdir(myloc)
-		tel2=0
-		for myfile in myfiles:
-			tel2=tel2+1
-			MyGefFiles = open('MyGefFiles.txt','a')
-			if myfile.lower()[-3:]=='gef':
-				mygef=myfile[:-4]
-				#myhash = hashlib.md5(open('%s\\%s'%(myloc,myfile),'rb').read()).hexdigest()
-				myhash = hashlib.md5(open('%s/%s'%(myloc,myfile),'rb').read()).hexdigest()
-				if mygef not in mygefs1 and myhash not in myhashes:
-					tel=tel+1
-					mygefs1.append(mygef)
-					myhashes.append(myhash)
-					if tel==1:
-#						MyGefFiles.write("'%s':{'gefnaam':'%s','gefloc':'%s\\\\%s','hash':'%s'}"%(mygef,mygef,myloc,myfile,myhash))
-						MyGefFiles.write("'%s':{'gefnaam':'%s','gefloc':'%s//%s','hash':'%s'}"%(mygef,mygef,myloc,myfile,myhash))
-					else:
-#						MyGefFiles.write(",'%s':{'gefnaam':'%s','gefloc':'%s\\\\%s','hash':'%s'}"%(mygef,mygef,myloc,myfile,myhash))
-						MyGefFiles.write(",'%s':{'gefnaam':'%s','gefloc':'%s//%s','hash':'%s'}"%(mygef,mygef,myloc,myfile,myhash))
-			MyGefFiles.close()
-	MyGefFiles= open('MyGefFiles.txt','a')
-	MyGefFiles.write('}')
-	MyGefFiles.close()
-	return 'bestanden staan in MyGefFiles.txt'
+		catalogus.update_directory(myloc, recursive=False)
+		for record in catalogus.query('map = ?', (os.path.abspath(myloc),)):
+			if record.naam in mygefs1 or record.hash in myhashes: # naam of inhoud al gezien
+				continue
+			mygefs1.add(record.naam)
+			myhashes.add(record.hash)
+			mydict[record.naam]={'gefnaam':record.naam,'gefloc':record.pad,'hash':record.hash}
+	catalogus.close()
+	return mydict
 
 ## Variabelen
 MyVglResult = open('MyVglResult.txt','w')
 mylocs=Gef2Config.Locaties()
 myFunctions = Gef2Config.Functies()
 ## Main
-getBestanden(mylocs) # info over gefbestanden wordt geplaatst in 'MyGefFiles.txt'
-a=open('MyGefFiles.txt','r')
-mydict=ast.literal_eval(a.readlines()[0])
-a.close()
+mydict=getBestanden(mylocs) # info over gefbestanden uit de catalogus 'MyGefFiles.sqlite'
 gefnaams=[]
 randList=randList(40)
 for i in randList:
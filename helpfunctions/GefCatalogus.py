@@ -0,0 +1 @@
+../GefCatalogus.py
\ No newline at end of file